@@ -10,6 +10,8 @@ from pytest import approx
 import numpy as np
 import xarray as xr
 import capytaine as cpy
+from autograd import jacobian, grad
+from scipy.optimize import Bounds, minimize
 
 import wecopttool as wot
 
@@ -581,6 +583,48 @@ class TestMIMOTransferMat:
         assert np.allclose(Z_mimo @ X, F)
 
 
+class TestMIMOTransferMatrix:
+    """Test class :python:`MIMOTransferMatrix`."""
+
+    @pytest.fixture(scope="class")
+    def transfer_mat(self, rao):
+        """Compact MIMO transfer matrix of the synthetic RAO."""
+        return wot.MIMOTransferMatrix(rao, False)
+
+    @pytest.fixture(scope="class")
+    def x(self, nfreq_imp, ndof_imp):
+        """Random state vectors, one per column."""
+        ncomponents = wot.ncomponents(nfreq_imp)
+        return np.random.randn(ncomponents*ndof_imp, 3)
+
+    def test_dense(self, transfer_mat, mimo):
+        """Test the dense matrix is the MIMO transfer matrix."""
+        assert transfer_mat.shape == mimo.shape
+        assert np.allclose(transfer_mat.to_dense(), mimo)
+        assert np.allclose(np.asarray(transfer_mat), mimo)
+
+    def test_matmul(self, transfer_mat, mimo, x):
+        """Test the product with state vectors and 2D arrays."""
+        assert np.allclose(transfer_mat @ x, mimo @ x)
+        assert np.allclose(transfer_mat @ x[:, 0], mimo @ x[:, 0])
+        assert np.allclose(transfer_mat @ list(x[:, 0]), mimo @ x[:, 0])
+
+    def test_transpose(self, transfer_mat, mimo, x):
+        """Test the transpose."""
+        assert np.allclose(transfer_mat.T @ x, mimo.T @ x)
+
+    def test_inverse(self, rao, x):
+        """Test the inverse for an invertible transfer matrix."""
+        rao = np.concatenate([[np.eye(2)], rao + 5*np.eye(2)])
+        transfer_mat = wot.MIMOTransferMatrix(rao)
+        assert np.allclose(transfer_mat.inv() @ (transfer_mat @ x), x)
+
+    def test_gradient(self, transfer_mat, mimo, x):
+        """Test the product can be differentiated with autograd."""
+        jac = jacobian(lambda y: transfer_mat @ y)(x[:, 0])
+        assert np.allclose(jac, mimo)
+
+
 class TestVecToDOFMatToVec:
     """Test functions :python:`vec_to_dofmat` and
     :python:`dofmat_to_vec`.
@@ -895,6 +939,55 @@ class TestFDToTDToFD:
         calculated = wot.td_to_fd(td_topfreq)
         assert calculated.shape==(nfreq+1, 2) and np.allclose(calculated, fd_topfreq)
 
+    def test_td_to_fd_jacobian(self, f1, nfreq):
+        """Test that the derivative of the :python:`td_to_fd` state is
+        the inverse of the time matrix.
+        """
+        td_to_state = lambda x: wot.complex_to_real(wot.td_to_fd(x))[:, 0]
+        jac = jacobian(td_to_state)(np.random.randn(2*nfreq))
+        assert np.allclose(jac, np.linalg.inv(wot.time_mat(f1, nfreq)))
+
+
+class TestStateToTD:
+    """Test function :python:`state_to_td`."""
+
+    @pytest.fixture(scope="class")
+    def x(self, ncomponents):
+        """Random states, one per column."""
+        return np.random.randn(ncomponents, 3)
+
+    @pytest.mark.parametrize("max_size", [2**17, 0])
+    @pytest.mark.parametrize("zero_freq", [True, False])
+    def test_time_mat(
+            self, x, f1, nfreq, nsubsteps, zero_freq, max_size, monkeypatch,
+        ):
+        """Test the output matches the time matrix product, with and
+        without assembling the time matrix.
+        """
+        monkeypatch.setattr(wot.core, '_time_mat_max_size', max_size)
+        x = x if zero_freq else x[1:]
+        for n in [1, nsubsteps]:
+            tmat = wot.time_mat(f1, nfreq, n, zero_freq)
+            calculated = wot.state_to_td(x, n, zero_freq)
+            calculated_1d = wot.state_to_td(x[:, 0], n, zero_freq)
+            assert np.allclose(calculated, tmat @ x)
+            assert np.allclose(calculated_1d, tmat @ x[:, 0])
+
+    def test_gradient(self, x, f1, nfreq, nsubsteps, monkeypatch):
+        """Test the inverse FFT can be differentiated with autograd."""
+        monkeypatch.setattr(wot.core, '_time_mat_max_size', 0)
+        jac = jacobian(lambda y: wot.state_to_td(y, nsubsteps))(x[:, 0])
+        assert np.allclose(jac, wot.time_mat(f1, nfreq, nsubsteps))
+
+    def test_cache_read_only(self, nfreq, nsubsteps):
+        """Test the cached arrays shared by all calls cannot be
+        modified in place.
+        """
+        for cached in [wot.core._unit_time_mat(nfreq, nsubsteps),
+                       wot.core._one_sided_scale(nfreq, nsubsteps)]:
+            with pytest.raises(ValueError):
+                cached[0] = 0.0
+
 
 class TestReadWriteNetCDF:
     """Test functions :python:`read_netcdf` and :python:`write_netcdf`.
@@ -1107,6 +1200,41 @@ class TestForceFromImpedanceOrTransferFunction:
         force_calculated = force_func(wec, x_wec, None, None)
         assert np.allclose(force_calculated, force)
 
+    def test_precompiled(self, rao):
+        """Test that the transfer matrix is assembled once, when the
+        force is created.
+        """
+        force_func = wot.force_from_rao_transfer_function(rao, False)
+        mimo = wot.mimo_transfer_mat(rao, False)
+        assert isinstance(force_func, wot.LinearForce)
+        assert np.allclose(force_func.transfer_mat, mimo)
+
+    def test_combine(self, rao, f1, nfreq_imp, ndof_imp, x_wec):
+        """Test that adding, subtracting, and negating linear forces
+        combines their transfer matrices.
+        """
+        force_a = wot.force_from_rao_transfer_function(rao, False)
+        force_b = wot.force_from_rao_transfer_function(2*rao, False)
+        combined = -force_a - force_a + force_b + force_a
+        wec = wot.WEC(f1, nfreq_imp, {}, ndof=ndof_imp, inertia_in_forces=True)
+        force_combined = combined(wec, x_wec, None, None)
+        force_calculated = force_a(wec, x_wec, None, None)
+        assert np.allclose(force_combined, force_calculated)
+
+    def test_truncate(self, rao, f1, ndof_imp, x_wec):
+        """Test that a truncated linear force is the force of the
+        truncated transfer matrix.
+        """
+        force_func = wot.force_from_rao_transfer_function(rao, False)
+        truncated = force_func.truncate(1)
+        wec = wot.WEC(f1, 1, {}, ndof=ndof_imp, inertia_in_forces=True)
+        x_wec_1 = wot.core._truncate_components(x_wec, 2, 1)
+        force_calculated = truncated(wec, x_wec_1, None, None)
+        force_expected = wot.force_from_rao_transfer_function(
+            rao[:1], False)(wec, x_wec_1, None, None)
+        assert not truncated.zero_freq
+        assert np.allclose(force_calculated, force_expected)
+
 
 class TestForceFromWaves:
     """Test function :python:`force_from_waves`."""
@@ -1155,6 +1283,40 @@ class TestForceFromWaves:
         # test
         assert np.allclose(force_calculated, force)
 
+    def test_cached(
+            self, exc_coeff, f1, nfreq, ndof_waves, wave_regular, waves_multi
+        ):
+        """Test the force is stored per waves object inside the cached
+        context and recomputed outside of it.
+        """
+        force_func = wot.force_from_waves(exc_coeff)
+        wec = wot.WEC(f1, nfreq, {}, ndof=ndof_waves, inertia_in_forces=True)
+        waves, _ = wave_regular
+        waves_2, _ = waves_multi
+        with force_func.cached():
+            force = force_func(wec, None, None, waves)
+            assert force_func(wec, None, None, waves) is force
+            force_2 = force_func(wec, None, None, waves_2)
+            assert np.allclose(
+                force_2, wot.force_from_waves(exc_coeff)(wec, None, None, waves_2))
+        assert force_func(wec, None, None, waves) is not force
+
+    def test_truncate(
+            self, exc_coeff, f1, nfreq, ndof_waves, waves_multi, fexc_multi
+        ):
+        """Test that a truncated excitation force keeps the first
+        frequencies.
+        """
+        waves, params = waves_multi
+        n = params['n']
+        truncated = wot.force_from_waves(exc_coeff).truncate(n)
+        wec = wot.WEC(f1, n, {}, ndof=ndof_waves, inertia_in_forces=True)
+        force_calculated = truncated(
+            wec, None, None, waves.isel(omega=slice(0, n)))
+        force_fd = wot.complex_to_real(fexc_multi[:n], False)
+        force_expected = wot.state_to_td(force_fd, zero_freq=False)
+        assert np.allclose(force_calculated, force_expected)
+
 
 class TestInertiaStandardForces:
     """Test functions :python:`inertia` and :python:`standard_forces`.
@@ -1511,6 +1673,32 @@ class TestDecomposeState:
         assert np.allclose(x_w_calc, x_wec) and np.allclose(x_o_calc, x_opt)
 
 
+class TestRegridState:
+    """Test function :python:`regrid_state`."""
+
+    def test_same_f1(self,):
+        """Test that zero-padding and truncating recovers the state,
+        for two blocks.
+        """
+        # X0 = 1, X1 = 2+3j, X2 = 4 for each block
+        state = np.array([1, 2, 3, 4, 5, 6, 7, 8])
+        padded = wot.regrid_state(state, 0.1, 2, 0.1, 3)
+        expected = np.array([1, 2, 3, 4, 0, 0, 5, 6, 7, 8, 0, 0])
+        assert np.allclose(padded, expected)
+        assert np.allclose(wot.regrid_state(padded, 0.1, 3, 0.1, 2), state)
+
+    def test_interpolation(self,):
+        """Test the Fourier coefficients are interpolated to a finer
+        fundamental frequency, with the same power spectral density.
+        """
+        state = np.array([1, 2, 4, 6])  # X0 = 1, X1 = 2+4j, X2 = 6
+        calculated = wot.regrid_state(state, 0.2, 2, 0.1, 4)
+        # 0.1 Hz: 1.5+2j, 0.2 Hz: 2+4j, 0.3 Hz: 4+2j, 0.4 Hz: 6
+        expected = np.array([1, 1.5, 2, 2, 4, 4, 2, 6])
+        expected[1:] = expected[1:] * np.sqrt(0.5)
+        assert np.allclose(calculated, expected)
+
+
 class TestFrequencyParameters:
     """Test function :python:`frequency_parameters`."""
 
@@ -1611,3 +1799,233 @@ class TestTimeResults:
             re2*np.cos(w[2]*t) - im2*np.sin(w[2]*t)
         )
         assert np.allclose(td.values, response)
+
+    @pytest.mark.parametrize("nsubsteps", [1, 3])
+    def test_fft(self, f1, nfreq, fd, nsubsteps):
+        """Test that the inverse FFT and the direct evaluation, for
+        times that are not equally spaced samples of the period, give
+        the same response.
+        """
+        fd_2d = fd.expand_dims({'type': ['a', 'b']}, axis=1)
+        t_fft = wot.time(f1, nfreq, nsubsteps)
+        t_direct = np.append(t_fft, 1/f1)
+        time_fft = xr.DataArray(
+            data=t_fft, name='time', dims='time', coords=[t_fft])
+        time_direct = xr.DataArray(
+            data=t_direct, name='time', dims='time', coords=[t_direct])
+        td_fft = wot.time_results(fd_2d, time_fft)
+        td_direct = wot.time_results(fd_2d, time_direct)
+        assert td_fft.dims == ('type', 'time')
+        assert np.allclose(td_fft.values, td_direct.values[:, :-1])
+        assert np.allclose(td_direct.values[:, -1], td_direct.values[:, 0])
+
+
+class TestMemoizedObjective:
+    """Test the hidden class :python:`core._MemoizedObjective`."""
+
+    def test_single_evaluation(self,):
+        """Test the value and gradient at the same point are obtained
+        from a single evaluation of the objective function.
+        """
+        nevals = []
+        def fun(x):
+            nevals.append(1)
+            return np.sum(x**2)
+        objective = wot.core._MemoizedObjective(fun, True)
+        x = np.array([1.0, 2.0])
+        assert objective.fun(x) == 5.0
+        assert np.allclose(objective.jac(x), 2*x)
+        assert objective.fun(x.copy()) == 5.0
+        assert len(nevals) == 1
+        assert objective.fun(2*x) == 20.0
+        assert len(nevals) == 2
+
+
+class TestSolveBudget:
+    """Test the hidden class :python:`core._SolveBudget`."""
+
+    def test_best_iterate(self,):
+        """Test the best iterate is the feasible iterate with the lowest
+        objective function and that the budget stops the evaluations.
+        """
+        constraints = [{'type': 'ineq', 'fun': lambda x: 1.0 - x}]
+        budget = wot.core._SolveBudget(
+            None, 2, 1e-6,
+            lambda x: wot.core._max_violation(constraints, None, x), None)
+        fun = budget.counted(lambda x: -1*np.sum(x))
+        for x in [np.array([0.5]), np.array([2.0]), np.array([1.0])]:
+            budget.record(x, -1*np.sum(x))
+        fun(x)
+        fun(x)
+        with pytest.raises(wot.core._BudgetExhausted):
+            fun(x)
+        res = budget.result("Stopped.")
+        assert np.allclose(res.x, 1.0)
+        assert res.fun == -1.0
+        assert res.maxcv == 0.0
+        assert res.nfev == 2
+        assert res.nit == 2
+        assert not res.success
+        assert res.budget_exhausted
+
+
+class TestIterationLimitReached:
+    """Test the hidden function :python:`core._iteration_limit_reached`.
+    """
+
+    @pytest.mark.parametrize("method",
+                             ['slsqp', 'bfgs', 'nelder-mead', 'l-bfgs-b'])
+    def test_limit(self, method):
+        """Test the iteration limit is detected for different methods."""
+        options = {'maxiter': 2}
+        res = minimize(lambda x: np.sum((x - np.arange(4))**4),
+                       np.zeros(4), method=method, options=options)
+        assert not res.success
+        assert wot.core._iteration_limit_reached(res, options)
+
+    def test_failure(self,):
+        """Test other failures are not reported as the iteration limit.
+        """
+        res = minimize(lambda x: x[0], np.zeros(1), method='slsqp',
+                       constraints=[{'type': 'eq', 'fun': lambda x: 1.0},])
+        assert not res.success
+        assert not wot.core._iteration_limit_reached(res, {})
+
+
+class TestSolveQuadratic:
+    """Test the hidden function :python:`core._solve_quadratic`."""
+
+    @pytest.fixture(scope="class")
+    def problem(self,):
+        """Strictly convex quadratic program with two equality
+        constraints.
+        """
+        rng = np.random.default_rng(1)
+        nvar = 8
+        sqrt_hess = rng.standard_normal((nvar, nvar))
+        hess = sqrt_hess @ sqrt_hess.T + np.eye(nvar)
+        grad = 5*rng.standard_normal(nvar)
+        jac = rng.standard_normal((2, nvar))
+        resid = rng.standard_normal(2)
+        fun = lambda x: 0.5*np.dot(x, np.dot(hess, x)) + np.dot(grad, x)
+        resid_fun = lambda x: np.dot(jac, x) + resid
+        return fun, resid_fun, jac, np.zeros(nvar)
+
+    def test_unbounded(self, problem):
+        """Test the solution satisfies the optimality conditions."""
+        fun, resid_fun, jac, x0 = problem
+        res = wot.core._solve_quadratic(fun, resid_fun, jac, x0)
+        mult = np.linalg.lstsq(jac.T, -res.jac, rcond=None)[0]
+        assert res.success
+        assert np.allclose(resid_fun(res.x), 0.0)
+        assert np.allclose(res.jac + jac.T @ mult, 0.0)
+
+    def test_bounds(self, problem):
+        """Test the solution with several active bounds matches the
+        optimizer.
+        """
+        fun, resid_fun, jac, x0 = problem
+        bounds = Bounds(-0.2*np.ones(len(x0)), 0.2*np.ones(len(x0)))
+        res = wot.core._solve_quadratic(fun, resid_fun, jac, x0, bounds)
+        res_opt = minimize(
+            fun, x0, jac=grad(fun), method='SLSQP', bounds=bounds,
+            constraints={'type': 'eq', 'fun': resid_fun},
+            options={'ftol': 1e-12, 'maxiter': 500})
+        assert res.success
+        assert np.allclose(resid_fun(res.x), 0.0)
+        assert np.all(np.abs(res.x) <= 0.2*(1 + 1e-10))
+        assert np.sum(np.isclose(np.abs(res.x), 0.2)) > 1
+        assert res.fun == approx(res_opt.fun, rel=1e-6)
+
+    def test_flat(self,):
+        """Test directions that do not affect the objective take a
+        minimum-norm value and that an unbounded problem is not solved.
+        """
+        fun = lambda x: (x[0] - 1.0)**2
+        jac = np.zeros((1, 2))
+        resid_fun = lambda x: np.dot(jac, x)
+        res = wot.core._solve_quadratic(fun, resid_fun, jac, np.ones(2))
+        assert np.allclose(res.x, [1.0, 0.0])
+        fun_unbounded = lambda x: (x[0] - 1.0)**2 - x[1]
+        assert wot.core._solve_quadratic(
+            fun_unbounded, resid_fun, jac, np.ones(2)) is None
+
+
+class TestTimeSeriesConstraint:
+    """Test function :python:`time_series_constraint`."""
+
+    @pytest.fixture(scope="class")
+    def wec(self, f1, nfreq):
+        """Empty WEC object."""
+        return wot.WEC(f1, nfreq, {}, ndof=1, inertia_in_forces=True)
+
+    @staticmethod
+    def series(wec, x_wec, x_opt, waves):
+        """Time series affine in the optimization state."""
+        return wot.state_to_td(np.reshape(x_opt, (-1, 1))) + 1.0
+
+    def test_values(self, wec, ncomponents):
+        """Test the constraint values for upper and lower bounds."""
+        x_opt = np.random.randn(ncomponents)
+        series = self.series(wec, None, x_opt, None).flatten()
+        upper = wot.time_series_constraint(self.series, upper=2.0)
+        both = wot.time_series_constraint(self.series, -3.0, 2.0)
+        assert upper['type'] == 'ineq'
+        assert upper['affine']
+        assert np.allclose(upper['fun'](wec, None, x_opt, None), 2.0-series)
+        assert np.allclose(
+            both['fun'](wec, None, x_opt, None),
+            np.concatenate([2.0-series, series+3.0]))
+
+    def test_error(self,):
+        """Test that a bound is required."""
+        with pytest.raises(ValueError):
+            wot.time_series_constraint(self.series)
+
+
+class TestAggregateConstraint:
+    """Test function :python:`aggregate_constraint`."""
+
+    @pytest.fixture(scope="class")
+    def wec(self, f1, nfreq):
+        """Empty WEC object."""
+        return wot.WEC(f1, nfreq, {}, ndof=1, inertia_in_forces=True)
+
+    @pytest.fixture(scope="class")
+    def constraint(self,):
+        """Time-series constraint with values between -1 and 1."""
+        def series(wec, x_wec, x_opt, waves):
+            return wot.state_to_td(np.reshape(x_opt, (-1, 1)))
+        return wot.time_series_constraint(series, -1.0, 1.0)
+
+    @pytest.mark.parametrize("method", ['ks', 'pnorm'])
+    def test_conservative(self, wec, constraint, ncomponents, method):
+        """Test that the aggregated constraint is a lower bound of the
+        minimum, and close to it for a large parameter.
+        """
+        x_opt = 0.1*np.random.randn(ncomponents)
+        exact = np.min(constraint['fun'](wec, None, x_opt, None))
+        agg = wot.aggregate_constraint(constraint, method=method)
+        agg_large = wot.aggregate_constraint(
+            constraint, method=method, parameter=1e4)
+        value = agg['fun'](wec, None, x_opt, None)
+        value_large = agg_large['fun'](wec, None, x_opt, None)
+        assert agg['type'] == 'ineq'
+        assert value.shape == (1,)
+        assert np.all(value <= exact)
+        assert value_large[0] == approx(exact, abs=1e-2)
+
+    def test_ngroups(self, wec, constraint, ncomponents):
+        """Test the number of aggregated constraints."""
+        x_opt = np.random.randn(ncomponents)
+        agg = wot.aggregate_constraint(constraint, ngroups=4)
+        assert agg['fun'](wec, None, x_opt, None).shape == (4,)
+
+    def test_error(self, constraint):
+        """Test that only inequality constraints and known methods are
+        accepted.
+        """
+        with pytest.raises(ValueError):
+            wot.aggregate_constraint({**constraint, 'type': 'eq'})
+        with pytest.raises(ValueError):
+            wot.aggregate_constraint(constraint, method='max')
@@ -5,6 +5,7 @@ from pytest import approx
 import wecopttool as wot
 import capytaine as cpy
 import autograd.numpy as np
+from autograd import jacobian
 from scipy.optimize import Bounds
 import xarray as xr
 
@@ -161,6 +162,27 @@ def resonant_wave(f1, nfreq, fb, hydro_data):
     return waves
 
 
+@pytest.fixture(scope='module')
+def solve_kwargs(pto, nfreq):
+    """Solve arguments for the unstructured PTO, with hand-tuned scale
+    factors"""
+    return {'obj_fun': pto.average_power,
+            'nstate_opt': 2*nfreq,
+            'scale_x_wec': 1e1,
+            'scale_x_opt': 1e-3,
+            'scale_obj': 1e-2,
+            }
+
+
+@pytest.fixture(scope='module')
+def auto_solve_kwargs(pto, nfreq):
+    """Solve arguments for the unstructured PTO, with automatic scaling"""
+    return {'obj_fun': pto.average_power,
+            'nstate_opt': 2*nfreq,
+            'auto_scale': True,
+            }
+
+
 def test_solve_callback(wec_from_bem, regular_wave, pto, nfreq, capfd):
     """Check that user can set a custom callback"""
 
@@ -226,6 +248,472 @@ def test_same_wec_init(wec_from_bem,
     assert imp_res == approx(bem_res, rel=0.01)
 
 
+def test_fused_linear_forces(wec_from_bem, regular_wave):
+    """Test that combining the linear forces into a single operator does
+    not change the residual"""
+
+    np.random.seed(0)
+    x_wec = np.random.randn(wec_from_bem.nstate_wec)
+    x_opt = np.random.randn(wec_from_bem.nstate_wec)
+    wave = regular_wave.sel(realization=0)
+    wec_from_bem.fuse_linear_forces = False
+    res_separate = wec_from_bem.residual(x_wec, x_opt, wave)
+    wec_from_bem.fuse_linear_forces = True
+    res_fused = wec_from_bem.residual(x_wec, x_opt, wave)
+
+    assert res_fused == approx(res_separate, rel=1e-10)
+
+
+def test_solve_affine_residual(hydro_data, regular_wave, pto, nfreq,
+                               solve_kwargs):
+    """Test that declaring the residual affine, and therefore using a
+    constant Jacobian for the dynamics constraint, gives the same
+    solution"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    kwargs = {**solve_kwargs,
+              'waves': regular_wave,
+              'x_wec_0': 1e-1*np.ones(wec.nstate_wec),
+              'x_opt_0': 1e-1*np.ones(2*nfreq),
+              }
+    res = wec.solve(**kwargs)
+    res_affine = wec.solve(affine_residual=True, **kwargs)
+
+    assert res_affine[0].fun == approx(res[0].fun, rel=1e-4)
+
+
+def test_solve_njobs(hydro_data, f1, nfreq, pto, solve_kwargs):
+    """Test that solving the realizations in parallel gives the same
+    results, in the same order, as solving them serially"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    spec_fun = lambda f: wot.waves.pierson_moskowitz_spectrum(
+        freq=f, fp=0.3, hs=0.0625*1.9)
+    efth = wot.waves.omnidirectional_spectrum(
+        f1=f1, nfreq=nfreq, spectrum_func=spec_fun)
+    waves = wot.waves.long_crested_wave(efth, nrealizations=2, seed=1)
+    kwargs = {**solve_kwargs,
+              'waves': waves,
+              'x_wec_0': 1e-1*np.ones(wec.nstate_wec),
+              'x_opt_0': 1e-1*np.ones(2*nfreq),
+              'max_nfev': 20,
+              }
+    res = wec.solve(**kwargs)
+    res_parallel = wec.solve(njobs=2, **kwargs)
+
+    assert len(res_parallel) == len(res)
+    for ires, ires_parallel in zip(res, res_parallel):
+        assert np.array_equal(ires_parallel.x, ires.x)
+        assert ires_parallel.fun == ires.fun
+
+
+def test_post_process_batch(hydro_data, long_crested_wave, pto, nfreq):
+    """Test that post-processing all realizations together gives the
+    same results as post-processing each realization"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    res = wec.solve(long_crested_wave, pto.average_power, 2*nfreq)
+    nsubsteps = 2
+    for obj in [wec, pto]:
+        res_fd, res_td = obj.post_process(
+            wec, res, long_crested_wave, nsubsteps)
+        res_fd_batch, res_td_batch = obj.post_process(
+            wec, res, long_crested_wave, nsubsteps, batch=True)
+        for results, batch in [(res_fd, res_fd_batch), (res_td, res_td_batch)]:
+            concat = xr.concat(results, dim='realization')
+            concat = concat.assign_coords(realization=batch.realization)
+            xr.testing.assert_allclose(concat, batch)
+
+
+def test_post_process_variables(hydro_data, regular_wave, pto, nfreq):
+    """Test that post-processing only the requested variables gives the
+    same values as post-processing all variables"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    res = wec.solve(regular_wave, pto.average_power, 2*nfreq)
+    for obj, variables in [(wec, ['pos', 'force']),
+                           (pto, ['power', 'force'])]:
+        res_fd, res_td = obj.post_process(wec, res, regular_wave)
+        res_fd_var, res_td_var = obj.post_process(
+            wec, res, regular_wave, variables=variables)
+        for results, results_var in [(res_fd, res_fd_var),
+                                     (res_td, res_td_var)]:
+            assert sorted(results_var[0].data_vars) == sorted(variables)
+            xr.testing.assert_allclose(
+                results_var[0], results[0][variables])
+        with pytest.raises(ValueError):
+            obj.post_process(wec, res, regular_wave, variables=['power_avg'])
+
+
+@pytest.mark.parametrize("fmax", [None, 500.0])
+def test_solve_quadratic_objective(fmax, hydro_data, regular_wave, pto, nfreq,
+                                   solve_kwargs):
+    """Test that the closed-form solution of the quadratic program
+    matches the optimizer solution, with and without bounds"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    bounds_opt = None
+    if fmax is not None:
+        bounds_opt = Bounds(lb=-fmax*np.ones(2*nfreq),
+                            ub=fmax*np.ones(2*nfreq))
+    kwargs = {**solve_kwargs,
+              'waves': regular_wave,
+              'x_wec_0': 1e-1*np.ones(wec.nstate_wec),
+              'x_opt_0': 1e-1*np.ones(2*nfreq),
+              'bounds_opt': bounds_opt,
+              'affine_residual': True,
+              'optim_options': {'maxiter': 500},
+              }
+    res = wec.solve(**kwargs)
+    res_qp = wec.solve(quadratic_objective=True, **kwargs)
+    x_wec, x_opt = wec.decompose_state(res_qp[0].x)
+    residual = wec.residual(x_wec, x_opt, regular_wave.sel(realization=0))
+
+    assert res_qp[0].fun == approx(res[0].fun, rel=1e-3)
+    assert res_qp[0].fun <= res[0].fun
+    assert np.max(np.abs(residual)) == approx(0, abs=1e-6)
+    if fmax is not None:
+        assert np.all(np.abs(x_opt) <= fmax*(1 + 1e-10))
+
+
+def test_solve_reduced_space(hydro_data, regular_wave, pto, nfreq,
+                             solve_kwargs):
+    """Test that eliminating the WEC state gives the same solution,
+    including bounds on the WEC state"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    bounds_wec = Bounds(lb=-0.15*np.ones(wec.nstate_wec),
+                        ub=0.15*np.ones(wec.nstate_wec))
+    kwargs = {**solve_kwargs,
+              'waves': regular_wave,
+              'x_wec_0': 1e-1*np.ones(wec.nstate_wec),
+              'x_opt_0': 1e-1*np.ones(2*nfreq),
+              'bounds_wec': bounds_wec,
+              'optim_options': {'maxiter': 500},
+              }
+    res = wec.solve(**kwargs)
+    res_reduced = wec.solve(reduced_space=True, **kwargs)
+    x_wec, x_opt = wec.decompose_state(res_reduced[0].x)
+    residual = wec.residual(x_wec, x_opt, regular_wave.sel(realization=0))
+
+    assert res_reduced[0].fun == approx(res[0].fun, rel=1e-3)
+    assert np.max(np.abs(residual)) == approx(0, abs=1e-6)
+    assert np.all(np.abs(x_wec) <= 0.15*(1 + 1e-6))
+
+
+def test_solve_reduced_space_singular(hydro_data, regular_wave, pto, nfreq):
+    """Test that the reduced space is rejected when the dynamics are
+    singular with respect to the WEC state, e.g. without a restoring
+    force"""
+
+    hd = hydro_data.copy()
+    hd['hydrostatic_stiffness'] = 0*hd['hydrostatic_stiffness']
+    wec = wot.WEC.from_bem(hd, f_add={"PTO": pto.force_on_wec})
+    with pytest.raises(ValueError, match="singular"):
+        wec.solve(regular_wave, pto.average_power, 2*nfreq,
+                  reduced_space=True)
+
+
+@pytest.mark.parametrize("initial_guess", ['conjugate', 'passive', 'free'])
+def test_solve_initial_guess(initial_guess, hydro_data, regular_wave, pto,
+                             solve_kwargs):
+    """Test that the solution from the analytical initial guesses
+    converges to the closed-form optimum"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    res_qp = wec.solve(regular_wave, quadratic_objective=True,
+                       **solve_kwargs)
+    res = wec.solve(regular_wave, initial_guess=initial_guess,
+                    **solve_kwargs)
+
+    assert res[0].status == 0
+    assert res[0].fun == approx(res_qp[0].fun, rel=1e-4)
+
+
+def test_solve_warm_start(hydro_data, regular_wave, pto, f1, nfreq,
+                          solve_kwargs, monkeypatch):
+    """Test that warm starting from a previous solution, including one
+    on a coarser frequency grid, converges immediately, without
+    computing initial guesses"""
+
+    nfreq_coarse = nfreq // 2
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    wec_coarse = wot.WEC.from_bem(
+        hydro_data.isel(omega=slice(0, nfreq_coarse)),
+        f_add={"PTO": pto.force_on_wec})
+    kwargs = {**solve_kwargs, 'initial_guess': 'free'}
+    res = wec.solve(regular_wave, **kwargs)
+    res_coarse = wec_coarse.solve(
+        wot.waves.regular_wave(f1, nfreq_coarse, 0.3, 0.0625, 0, 0),
+        **{**kwargs, 'nstate_opt': 2*nfreq_coarse})
+    guesses = []
+    initial_guess = wec._initial_guess
+    def counted_guess(*args, **kwargs):
+        guesses.append(1)
+        return initial_guess(*args, **kwargs)
+    monkeypatch.setattr(wec, '_initial_guess', counted_guess)
+    for warm_start in [res, res_coarse]:
+        res_warm = wec.solve(regular_wave, warm_start=warm_start,
+                             fourier_opt=True, **kwargs)
+        assert res_warm[0].nit <= 2
+        assert res_warm[0].fun == approx(res[0].fun, rel=1e-4)
+    assert not guesses
+
+
+def test_solve_warm_start_f1(hydro_data, regular_wave, pto, nfreq,
+                             solve_kwargs):
+    """Test that warm starting from a solution with a different
+    fundamental frequency converges to the same solution"""
+
+    # every other frequency, twice the fundamental frequency
+    nfreq_2 = nfreq // 2
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    wec_2 = wot.WEC.from_bem(
+        hydro_data.isel(omega=slice(1, 2*nfreq_2, 2)),
+        f_add={"PTO": pto.force_on_wec})
+    res = wec.solve(regular_wave, **solve_kwargs)
+    res_2 = wec_2.solve(
+        wot.waves.regular_wave(wec_2.f1, nfreq_2, 0.3, 0.0625, 0, 0),
+        **{**solve_kwargs, 'nstate_opt': 2*nfreq_2})
+    res_warm = wec.solve(regular_wave, warm_start=res_2, fourier_opt=True,
+                         **solve_kwargs)
+    assert wec_2.f1 == approx(2*wec.f1)
+    assert wec._warm_start_state(res_2[0], 2*nfreq, True) is not None
+    assert res_warm[0].fun == approx(res[0].fun, rel=1e-4)
+
+
+def test_initial_guess_affine(hydro_data, regular_wave, pto, nfreq):
+    """Test that the initial guess from the constant Jacobian of an
+    affine residual matches the Gauss-Newton fit"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    wave = regular_wave.sel(realization=0)
+    x_wec, x_opt = wec._initial_guess(wave, 2*nfreq)
+    jac_opt = jacobian(
+        lambda x_opt: wec.residual(x_wec, x_opt, wave))(x_opt)
+    x_wec_affine, x_opt_affine = wec._initial_guess(
+        wave, 2*nfreq, jac_opt=jac_opt)
+    assert np.allclose(x_wec_affine, x_wec)
+    assert np.allclose(x_opt_affine, x_opt, rtol=1e-6,
+                       atol=1e-8*np.max(np.abs(x_opt)))
+
+
+def test_solve_nfreq_coarse(hydro_data, regular_wave, pto, nfreq,
+                            solve_kwargs):
+    """Test that a coarse-to-fine continuation converges to the same
+    solution as solving directly on the full grid"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    kwargs = {**solve_kwargs, 'initial_guess': 'free'}
+    res = wec.solve(regular_wave, **kwargs)
+    res_coarse = wec.solve(regular_wave, nfreq_coarse=[nfreq//4, nfreq//2],
+                           fourier_opt=True, **kwargs)
+    assert res_coarse[0].x.size == res[0].x.size
+    assert res_coarse[0].fun == approx(res[0].fun, rel=1e-3)
+    with pytest.raises(ValueError):
+        wec.solve(regular_wave, nfreq_coarse=nfreq//2, **kwargs)
+
+
+def test_solve_nfreq_coarse_impedance(f1, hydro_data, regular_wave, nfreq,
+                                      solve_kwargs):
+    """Test that a coarse-to-fine continuation truncates a PTO with an
+    impedance, used for the force and the objective function"""
+
+    omega = wot.frequency(f1, nfreq, False)*2*np.pi
+    gear_ratio = 12.0
+    off_diag = -1*np.sqrt(3.0/2.0)*6.7*gear_ratio*np.ones(nfreq)
+    impedance = np.array([
+        [-1*gear_ratio**2*(1j*omega*2.0 + 1.0), off_diag],
+        [off_diag, 0.5*np.ones(nfreq)],
+    ]) + 0j
+    pto = wot.pto.PTO(1, np.eye(1), impedance=impedance)
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    kwargs = {**solve_kwargs,
+              'obj_fun': pto.average_power,
+              'initial_guess': 'free',
+              }
+    res = wec.solve(regular_wave, **kwargs)
+    res_coarse = wec.solve(regular_wave, nfreq_coarse=nfreq//2,
+                           fourier_opt=True, **kwargs)
+    assert res_coarse[0].fun == approx(res[0].fun, rel=1e-3)
+
+
+def test_solve_auto_scale(hydro_data, regular_wave, pto, nfreq,
+                          solve_kwargs, auto_solve_kwargs):
+    """Test that automatic scaling converges to the same solution as
+    the hand-tuned scaling"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    kwargs = {**auto_solve_kwargs, 'initial_guess': 'free'}
+    res = wec.solve(regular_wave, initial_guess='free', **solve_kwargs)
+    res_auto = wec.solve(regular_wave, **kwargs)
+    res_partial = wec.solve(regular_wave, scale_obj=1e-2, **kwargs)
+    assert res_auto[0].fun == approx(res[0].fun, rel=1e-3)
+    assert res_partial[0].fun == approx(res[0].fun, rel=1e-3)
+
+    # scale factors from the warm start
+    res_warm = wec.solve(regular_wave, warm_start=res, **kwargs)
+    assert res_warm[0].fun == approx(res[0].fun, rel=1e-3)
+
+    # provided scale factors take precedence
+    wave = regular_wave.sel(realization=0)
+    x_ref = np.concatenate(wec._initial_guess(wave, 2*nfreq))
+    scale = 7.0*np.ones(x_ref.size)
+    scale_auto, scale_obj_auto = wec._auto_scale(
+        [(0, wave)], [x_ref], pto.average_power, True, scale, 3.0,
+        [True, False, False])
+    assert np.all(scale_auto[wec.nstate_wec:] == 7.0)
+    assert not np.allclose(scale_auto[:wec.nstate_wec], 7.0)
+    assert scale_obj_auto == 3.0
+
+
+def test_solve_trust_constr(hydro_data, regular_wave, pto,
+                            auto_solve_kwargs):
+    """Test that the trust-constr method, with linear dynamics,
+    finds the same solution as SLSQP"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    res = wec.solve(regular_wave, **auto_solve_kwargs)
+    res_tc = wec.solve(regular_wave, method='trust-constr',
+                       optim_options={'gtol': 1e-6}, **auto_solve_kwargs)
+    assert res_tc[0].fun == approx(res[0].fun, rel=1e-4)
+    assert res_tc[0].jac.shape == res_tc[0].x.shape
+
+
+@pytest.mark.parametrize("method,reduced_space",
+                         [('trust-constr', False), ('trust-ncg', True)])
+def test_solve_use_hess(hydro_data, regular_wave, pto, auto_solve_kwargs,
+                        method, reduced_space):
+    """Test that second-order methods with exact Hessians converge in a
+    few iterations to the same solution as SLSQP"""
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    kwargs = {**auto_solve_kwargs, 'initial_guess': 'free'}
+    res = wec.solve(regular_wave, **kwargs)
+    res_hess = wec.solve(regular_wave, method=method, use_hess=True,
+                         reduced_space=reduced_space,
+                         optim_options={'gtol': 1e-6}, **kwargs)
+    assert res_hess[0].nit <= 20
+    assert res_hess[0].fun == approx(res[0].fun, rel=1e-4)
+
+
+@pytest.mark.parametrize("method", ['SLSQP', 'trust-constr'])
+def test_solve_time_series_constraint(hydro_data, regular_wave, pto,
+                                      auto_solve_kwargs, method):
+    """Test that an affine time-series constraint finds the same
+    solution as the equivalent absolute value constraint"""
+
+    f_max = 600.0
+    nsubsteps = 2
+
+    def f_pto(wec, x_wec, x_opt, waves):
+        return pto.force_on_wec(wec, x_wec, x_opt, waves, nsubsteps)
+
+    def const_f_pto(wec, x_wec, x_opt, waves):
+        return f_max - np.abs(f_pto(wec, x_wec, x_opt, waves).flatten())
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec},
+                           constraints=[{'type': 'ineq', 'fun': const_f_pto}])
+    res = wec.solve(regular_wave, **auto_solve_kwargs)
+    wec_ts = wot.WEC.from_bem(
+        hydro_data, f_add={"PTO": pto.force_on_wec},
+        constraints=[wot.time_series_constraint(f_pto, -f_max, f_max)])
+    optim_options = {}
+    if method == 'trust-constr':
+        optim_options = {'gtol': 1e-8, 'xtol': 1e-12,
+                         'initial_barrier_parameter': 1e-4}
+    res_ts = wec_ts.solve(regular_wave, method=method, use_hess=True,
+                          optim_options=optim_options, **auto_solve_kwargs)
+    x_wec, x_opt = wec_ts.decompose_state(res_ts[0].x)
+    f = f_pto(wec_ts, x_wec, x_opt, regular_wave.sel(realization=0))
+    assert np.max(np.abs(f)) <= f_max*(1 + 1e-4)
+    assert res_ts[0].fun == approx(res[0].fun, rel=1e-2)
+
+
+def test_solve_aggregate_constraint(hydro_data, regular_wave, pto,
+                                    auto_solve_kwargs):
+    """Test that an aggregated time-series constraint is satisfied and
+    finds a solution close to the exact constraint"""
+
+    f_max = 600.0
+
+    def f_pto(wec, x_wec, x_opt, waves):
+        return pto.force_on_wec(wec, x_wec, x_opt, waves)
+
+    constraint = wot.time_series_constraint(f_pto, -f_max, f_max)
+    kwargs = {**auto_solve_kwargs, 'optim_options': {'maxiter': 1000}}
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec},
+                           constraints=[constraint])
+    res = wec.solve(regular_wave, **kwargs)
+    wec_agg = wot.WEC.from_bem(
+        hydro_data, f_add={"PTO": pto.force_on_wec},
+        constraints=[wot.aggregate_constraint(constraint, f_max)])
+    res_agg = wec_agg.solve(regular_wave, **kwargs)
+    x_wec, x_opt = wec_agg.decompose_state(res_agg[0].x)
+    f = f_pto(wec_agg, x_wec, x_opt, regular_wave.sel(realization=0))
+    assert np.max(np.abs(f)) <= f_max*(1 + 1e-4)
+    assert res_agg[0].fun == approx(res[0].fun, rel=2e-2)
+
+
+def test_solve_budget(hydro_data, regular_wave, pto, auto_solve_kwargs):
+    """Test that an exhausted evaluation or time budget returns the best
+    feasible iterate instead of raising an exception"""
+
+    f_max = 600.0
+
+    def const_f_pto(wec, x_wec, x_opt, waves):
+        f = pto.force_on_wec(wec, x_wec, x_opt, waves, 2)
+        return f_max - np.abs(f.flatten())
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec},
+                           constraints=[{'type': 'ineq', 'fun': const_f_pto}])
+    kwargs = {**auto_solve_kwargs, 'initial_guess': 'free'}
+    res = wec.solve(regular_wave, **kwargs)
+    res_nfev = wec.solve(regular_wave, max_nfev=2, **kwargs)
+    res_time = wec.solve(regular_wave, time_limit=0.0, **kwargs)
+    for res_budget in [res_nfev[0], res_time[0]]:
+        assert res_budget.budget_exhausted
+        assert not res_budget.success
+        assert res_budget.maxcv <= 1e-6
+        assert res_budget.fun >= res[0].fun
+    assert res_nfev[0].nfev == 2
+
+
+@pytest.mark.parametrize("warm_start", [None, 'previous'])
+def test_solve_checkpoint(hydro_data, long_crested_wave, pto,
+                          auto_solve_kwargs, tmp_path, warm_start):
+    """Test that an interrupted solve resumes from its checkpoint,
+    skipping the finished realizations"""
+
+    class Interrupt(Exception):
+        pass
+
+    def interrupt(wec, x_wec, x_opt, waves):
+        if waves.realization == 1:
+            raise Interrupt()
+
+    wec = wot.WEC.from_bem(hydro_data, f_add={"PTO": pto.force_on_wec})
+    kwargs = {**auto_solve_kwargs,
+              'initial_guess': 'free',
+              'warm_start': warm_start,
+              }
+    res = wec.solve(long_crested_wave, **kwargs)
+    fpath = tmp_path / 'checkpoint.pkl'
+    with pytest.raises(Interrupt):
+        wec.solve(long_crested_wave, checkpoint=fpath,
+                  checkpoint_interval=1, callback=interrupt, **kwargs)
+    if warm_start is None:
+        with pytest.raises(ValueError):
+            wec.solve(long_crested_wave, resume_from=fpath, njobs=2,
+                      **kwargs)
+    res_resumed = wec.solve(long_crested_wave, checkpoint=fpath,
+                            resume_from=fpath, **kwargs)
+    assert len(res_resumed) == len(res)
+    assert res_resumed[0].nit == res[0].nit
+    for res_i, res_resumed_i in zip(res, res_resumed):
+        assert res_resumed_i.fun == approx(res_i.fun, rel=1e-4)
+
+
 class TestTheoreticalPowerLimits:
     """Compare power from numerical solutions against known theoretical limits
     """
@@ -282,3 +282,91 @@ class TestControllers:
         x_opt = [pid_p, pid_i, pid_d]
         calculated = pto.force(wec, x_wec, x_opt, None)
         assert np.allclose(force, calculated)
+
+
+class TestCached:
+    """Test the shared evaluation of the PTO quantities."""
+
+    @pytest.fixture(scope="class")
+    def wec(self, f1, nfreq):
+        """Empty WEC object."""
+        return wot.WEC(f1, nfreq, {}, ndof=1, inertia_in_forces=True)
+
+    def test_cached(self, wec, ndof, nfreq):
+        """Test that the quantities are reused for the same arguments
+        inside the context, and only inside it.
+        """
+        nevals = []
+        def kinematics(pos_wec):
+            nevals.append(1)
+            return np.ones((1, 1, pos_wec.shape[0]))
+        pto = wot.pto.PTO(ndof, kinematics)
+        x_wec = np.random.randn(wec.nstate_wec)
+        x_opt = np.random.randn(2*nfreq)
+        with pto.cached():
+            vel = pto.velocity(wec, x_wec, x_opt)
+            power = pto.mechanical_power(wec, x_wec, x_opt)
+            assert pto.velocity(wec, x_wec, x_opt) is vel
+            assert len(nevals) == 1
+            vel_2 = pto.velocity(wec, x_wec.copy(), x_opt)
+            assert len(nevals) == 2
+        assert np.allclose(vel_2, vel)
+        assert np.allclose(power, pto.mechanical_power(wec, x_wec, x_opt))
+        assert len(nevals) == 3
+        assert pto._cache is None
+
+
+class TestKinematics:
+    """Test the constant (linear) kinematics."""
+
+    @pytest.fixture(scope="class")
+    def wec(self, f1, nfreq):
+        """Empty two-DOF WEC object."""
+        return wot.WEC(f1, nfreq, {}, ndof=2, inertia_in_forces=True)
+
+    def test_linear(self, wec, nfreq):
+        """Test that a constant kinematics matrix gives the same values
+        as the equivalent kinematics function.
+        """
+        kinematics = np.array([[1.5, -0.4]])
+        def kinematics_fun(pos_wec_td):
+            n = pos_wec_td.shape[0]
+            return np.repeat(kinematics[:, :, np.newaxis], n, axis=-1)
+        pto = wot.pto.PTO(1, kinematics)
+        pto_fun = wot.pto.PTO(1, kinematics_fun)
+        x_wec = np.random.randn(wec.nstate_wec)
+        x_opt = np.random.randn(2*nfreq)
+        for nsubsteps in [1, 3]:
+            for method in ['position', 'velocity', 'acceleration',
+                           'force_on_wec']:
+                value = getattr(pto, method)(
+                    wec, x_wec, x_opt, None, nsubsteps)
+                expected = getattr(pto_fun, method)(
+                    wec, x_wec, x_opt, None, nsubsteps)
+                assert value.shape == expected.shape
+                assert np.allclose(value, expected)
+
+
+class TestTruncate:
+    """Test the PTO restricted to fewer frequencies."""
+
+    @pytest.fixture(scope="class")
+    def wec(self, f1):
+        """Empty WEC object with one frequency."""
+        return wot.WEC(f1, 1, {}, ndof=1, inertia_in_forces=True)
+
+    def test_truncate(self, wec, ndof, nfreq, pto_impedance):
+        """Test that the impedance is truncated and that the truncated
+        PTO can be evaluated on the coarse frequency grid.
+        """
+        pto = wot.pto.PTO(ndof, np.eye(ndof), impedance=pto_impedance)
+        pto_coarse = pto.truncate(1)
+        assert np.allclose(pto_coarse.impedance, pto_impedance[:, :, :1])
+        assert pto_coarse.transfer_mat.nfreq == 1
+        assert pto_coarse.names == pto.names
+        x_wec = np.random.randn(wec.nstate_wec)
+        x_opt = np.random.randn(wec.ncomponents)
+        power = pto_coarse.average_power(wec, x_wec, x_opt)
+        assert np.isfinite(power)
+        with pytest.raises(ValueError):
+            pto.truncate(nfreq + 1)
@@ -16,6 +16,9 @@ from __future__ import annotations
 
 __all__ = [
     "WEC",
+    "LinearForce",
+    "ExcitationForce",
+    "MIMOTransferMatrix",
     "ncomponents",
     "frequency",
     "time",
@@ -29,6 +32,7 @@ __all__ = [
     "complex_to_real",
     "fd_to_td",
     "td_to_fd",
+    "state_to_td",
     "read_netcdf",
     "write_netcdf",
     "check_radiation_damping",
@@ -38,6 +42,8 @@ __all__ = [
     "force_from_waves",
     "inertia",
     "standard_forces",
+    "time_series_constraint",
+    "aggregate_constraint",
     "run_bem",
     "change_bem_convention",
     "add_linear_friction",
@@ -48,6 +54,7 @@ __all__ = [
     "subset_close",
     "scale_dofs",
     "decompose_state",
+    "regrid_state",
     "frequency_parameters",
     "time_results",
     "set_fb_centers",
@@ -56,20 +63,31 @@ __all__ = [
 
 import logging
 from typing import Iterable, Callable, Any, Optional, Mapping, TypeVar, Union
+from typing import Iterator
 from pathlib import Path
+import os
+import pickle
+import re
 import warnings
+from functools import lru_cache
+from contextlib import contextmanager, ExitStack
 from datetime import datetime
+from time import perf_counter
 
 from numpy.typing import ArrayLike
 import autograd.numpy as np
 from autograd.numpy import ndarray
 from autograd.builtins import isinstance, tuple, list, dict
-from autograd import grad, jacobian
+from autograd import jacobian, hessian, value_and_grad
+from autograd import hessian_vector_product
 import xarray as xr
 from xarray import DataArray, Dataset
 import capytaine as cpy
 from scipy.optimize import minimize, OptimizeResult, Bounds
-from scipy.linalg import block_diag, dft
+from scipy.optimize import LinearConstraint, NonlinearConstraint
+from scipy.sparse.linalg import LinearOperator
+from scipy.linalg import block_diag, dft, null_space
+from joblib import Parallel, delayed, parallel_backend
 
 
 # logger
@@ -83,6 +101,30 @@ warnings.filterwarnings("ignore", message=filter_msg)
 _default_parameters = {'rho': 1025.0, 'g': 9.81, 'depth': np.infty}
 _default_min_damping = 1e-6
 
+# largest time matrix (number of entries) applied directly, larger
+# conversions from state to time-series use the inverse real FFT
+_time_mat_max_size = 2**17
+
+# largest condition number of the dynamics with respect to the WEC state
+# for the reduced-space formulation
+_max_condition_number = 1e10
+
+# optimizer exit messages for the maximum number of iterations or
+# function evaluations, logged as a warning instead of raising an exception
+_iteration_limit_message = re.compile(
+    r'(iteration|function evaluation)s?\b.*\b(limit|exceeded|reached)' +
+    r'|maximum number of (iteration|function evaluation)s',
+    re.IGNORECASE)
+
+# optimization methods that use the Hessian, and those that accept
+# Hessian-vector products instead
+_hess_methods = ['newton-cg', 'dogleg', 'trust-ncg', 'trust-krylov',
+                 'trust-exact', 'trust-constr']
+_hessp_methods = ['newton-cg', 'trust-ncg', 'trust-krylov', 'trust-constr']
+
+# initial guess strategies of the decision variable
+_initial_guess_strategies = ['conjugate', 'passive', 'free', 'random']
+
 # type aliases
 TWEC = TypeVar("TWEC", bound="WEC")
 TStateFunction = Callable[
@@ -122,6 +164,7 @@ class WEC:
         ndof: Optional[int] = None,
         inertia_in_forces: Optional[bool] = False,
         dof_names: Optional[Iterable[str]] = None,
+        fuse_linear_forces: Optional[bool] = True,
         ) -> None:
         """Create a WEC object directly from its inertia matrix and
         list of forces.
@@ -159,6 +202,12 @@ class WEC:
             List of constraints, see documentation for
             :py:func:`scipy.optimize.minimize` for description and
             options of constraints dictionaries.
+            The constraint functions have the signature
+            :python:`fun(wec, x_wec, x_opt, waves)`.
+            A constraint with the entry :python:`'affine': True` is
+            affine in the decision variable and its Jacobian is only
+            computed once per wave realization, see
+            :py:func:`wecopttool.time_series_constraint`.
             If :python:`None`: empty list :python:`[]`.
         inertia_matrix
            Inertia matrix of size :python:`(ndof, ndof)`.
@@ -178,6 +227,14 @@ class WEC:
             :python:`'Heave'`).
             If :python:`None` the names
             :python:`['DOF_0', ..., 'DOF_N']` are used.
+        fuse_linear_forces
+            Whether to combine the inertia and all linear forces
+            (:py:class:`wecopttool.LinearForce`) into a single operator,
+            and all excitation forces
+            (:py:class:`wecopttool.ExcitationForce`) into a single
+            excitation force, when evaluating
+            :py:meth:`wecopttool.WEC.residual`.
+            Other forces are evaluated one by one.
 
         Raises
         ------
@@ -212,6 +269,8 @@ class WEC:
         self._derivative_mat = derivative_mat(f1, nfreq)
         self._derivative2_mat = derivative2_mat(f1, nfreq)
         self._forces = forces
+        self._fuse_linear_forces = fuse_linear_forces
+        self._fused_forces_cache = None
         constraints = list(constraints) if (constraints is not None) else []
         self._constraints = constraints
 
@@ -574,6 +633,63 @@ class WEC:
                   inertia_in_forces=True, ndof=shape[1])
         return wec
 
+    def truncate(self, nfreq: int) -> TWEC:
+        """Create a copy of the WEC restricted to the first
+        :python:`nfreq` frequencies.
+
+        :py:class:`wecopttool.LinearForce` and
+        :py:class:`wecopttool.ExcitationForce` forces are truncated.
+        Forces and constraint functions that are methods of an object
+        with a :python:`truncate` method, e.g.
+        :py:meth:`wecopttool.pto.PTO.force_on_wec`, are bound to the
+        truncated object, see :py:meth:`wecopttool.pto.PTO.truncate`.
+        Other forces and constraints are reused as they are and must
+        support any number of frequencies, e.g. by using the
+        properties of the :python:`wec` argument.
+
+        Parameters
+        ----------
+        nfreq
+            Number of frequencies (not including zero frequency) of the
+            new WEC.
+
+        Raises
+        ------
+        ValueError
+            If :python:`nfreq` is larger than the number of frequencies
+            of this WEC.
+        """
+        return self._truncate(nfreq, {})
+
+    def _truncate(self, nfreq: int, truncated: dict) -> TWEC:
+        """Truncated copy of the WEC, see
+        :py:meth:`wecopttool.WEC.truncate`.
+
+        The truncated owners of bound methods are stored in
+        :python:`truncated`, by :python:`id`, so that they can be shared
+        with e.g. the objective function.
+        """
+        if nfreq > self.nfreq:
+            raise ValueError(
+                f"'nfreq' ({nfreq}) cannot be larger than the number of " +
+                f"frequencies of the WEC ({self.nfreq}).")
+        forces = {name: _truncate_function(force, nfreq, truncated)
+                  for name, force in self.forces.items()}
+        constraints = []
+        for icons in self.constraints:
+            icons = dict(icons)
+            for key in ['fun', 'jac']:
+                if key in icons:
+                    icons[key] = _truncate_function(
+                        icons[key], nfreq, truncated)
+            constraints.append(icons)
+        return WEC(self.f1, nfreq, forces, constraints,
+                   inertia_matrix=self.inertia_matrix,
+                   ndof=self.ndof if self.inertia_in_forces else None,
+                   inertia_in_forces=self.inertia_in_forces,
+                   dof_names=self.dof_names,
+                   fuse_linear_forces=self.fuse_linear_forces)
+
     def residual(self, x_wec: ndarray, x_opt: ndarray, waves: Dataset,
         ) -> float:
         """
@@ -589,15 +705,269 @@ class WEC:
             :py:class:`xarray.Dataset` with the structure and elements
             shown by :py:mod:`wecopttool.waves`.
         """
-        if not self.inertia_in_forces:
-            ri = self.inertia(self, x_wec, x_opt, waves)
+        if self.fuse_linear_forces:
+            intrinsic, excitation, forces = self._fused_forces()
+        else:
+            intrinsic, excitation = self.inertia, None
+            forces = list(self.forces.values())
+        if intrinsic is not None:
+            ri = intrinsic(self, x_wec, x_opt, waves)
         else:
             ri = np.zeros([self.ncomponents, self.ndof])
         # forces, -Σf
-        for f in self.forces.values():
+        if excitation is not None:
+            ri = ri - excitation(self, x_wec, x_opt, waves)
+        for f in forces:
             ri = ri - f(self, x_wec, x_opt, waves)
         return self.dofmat_to_vec(ri)
 
+    def _fused_forces(self,
+    ) -> tuple[Optional[LinearForce], Optional[ExcitationForce], list]:
+        """Combine the inertia and linear forces into a single linear
+        operator (:math:`ma-Σf_{linear}`), and the excitation forces
+        into a single excitation force.
+
+        The result is cached and only rebuilt if the
+        :python:`forces` dictionary changes.
+
+        Returns
+        -------
+        intrinsic
+            Combined inertia and linear forces, :python:`None` if
+            there are none.
+        excitation
+            Combined excitation force, :python:`None` if there is
+            none.
+        forces
+            Remaining forces, to be evaluated one by one.
+        """
+        items = list(self.forces.items())
+        if self._fused_forces_cache is not None:
+            cached_items, fused = self._fused_forces_cache
+            same = (len(items) == len(cached_items)) and all(
+                (ka == kb) and (fa is fb)
+                for (ka, fa), (kb, fb) in zip(items, cached_items))
+            if same:
+                return fused
+
+        intrinsic = self.inertia
+        excitation = None
+        forces = []
+        for _, f in items:
+            if isinstance(f, LinearForce):
+                intrinsic = -f if (intrinsic is None) else intrinsic - f
+            elif isinstance(f, ExcitationForce):
+                if excitation is None:
+                    excitation = f
+                    continue
+                try:
+                    excitation = excitation + f
+                except ValueError:
+                    # different frequencies or wave directions
+                    forces.append(f)
+            else:
+                forces.append(f)
+        fused = (intrinsic, excitation, forces)
+        self._fused_forces_cache = (items, fused)
+        return fused
+
+    @contextmanager
+    def _cached_excitation(self) -> Iterator[None]:
+        """Context in which all excitation forces are cached, see
+        :py:meth:`wecopttool.ExcitationForce.cached`.
+        """
+        forces = list(self.forces.values())
+        if self.fuse_linear_forces:
+            _, excitation, remaining = self._fused_forces()
+            forces += [excitation] + remaining
+        excitation = {
+            id(f): f for f in forces if isinstance(f, ExcitationForce)}
+        with ExitStack() as stack:
+            for f in excitation.values():
+                stack.enter_context(f.cached())
+            yield
+
+    def _initial_guess(self,
+        waves: Optional[Dataset],
+        nstate_opt: int,
+        strategy: Optional[str] = 'conjugate',
+        jac_opt: Optional[Union[ndarray, Callable[[], ndarray]]] = None,
+    ) -> tuple[ndarray, ndarray]:
+        """Initial guess of the WEC and optimization states for a
+        single wave realization.
+
+        See the :python:`initial_guess` argument of
+        :py:meth:`wecopttool.WEC.solve` for the strategies.
+
+        Parameters
+        ----------
+        waves
+            :py:class:`xarray.Dataset` with the structure and elements
+            shown by :py:mod:`wecopttool.waves`, for a single
+            realization.
+        nstate_opt
+            Length of the optimization (controls) state vector.
+        strategy
+            Initial guess strategy.
+        jac_opt
+            Constant Jacobian of an affine residual with respect to
+            :python:`x_opt`, or a function that returns it.
+            If provided, the optimization state is obtained from a
+            single least-squares solve instead of Gauss-Newton
+            iterations.
+
+        Raises
+        ------
+        ValueError
+            If :python:`strategy` is not a valid strategy.
+        """
+        if strategy not in _initial_guess_strategies:
+            raise ValueError(
+                f"Unknown initial guess '{strategy}', must be one of " +
+                f"{_initial_guess_strategies}.")
+        intrinsic, excitation, _ = self._fused_forces()
+        if (strategy != 'random') and ((intrinsic is None) or
+                                       (excitation is None)):
+            _log.warning(
+                f"The '{strategy}' initial guess requires linear and " +
+                "excitation forces, using a random initial guess.")
+            strategy = 'random'
+        if strategy == 'random':
+            return np.random.randn(self.nstate_wec), np.random.randn(nstate_opt)
+
+        # WEC motion, (Z + Z_pto) v = F_exc for a PTO impedance Z_pto
+        iomega = 1j*self.omega[1:, None, None]
+        impedance = intrinsic.rao_transfer_mat[1:] / iomega
+        force_exc = wave_excitation(excitation.force_coeff, waves)
+        if strategy == 'conjugate':
+            impedance_pto = np.conj(np.transpose(impedance, (0, 2, 1)))
+        elif strategy == 'passive':
+            ifreq = np.argmax(np.sum(np.abs(force_exc)**2, axis=1))
+            damping = np.abs(np.diagonal(impedance[ifreq]))
+            impedance_pto = np.diag(damping) * np.ones(impedance.shape)
+        else:
+            impedance_pto = np.zeros(impedance.shape)
+        vel = np.linalg.pinv(impedance + impedance_pto) @ force_exc[..., None]
+        pos = vel / iomega
+        pos = np.concatenate([np.zeros((1, self.ndof)), pos[..., 0]])
+        x_wec = self.dofmat_to_vec(complex_to_real(pos))
+
+        # optimization state, Gauss-Newton least-squares fit of the dynamics
+        x_opt = np.zeros(nstate_opt)
+        if nstate_opt > 0:
+            def resid_opt(x_opt):
+                return self.residual(x_wec, x_opt, waves)
+            if callable(jac_opt):
+                jac_opt = jac_opt()
+            if jac_opt is not None:
+                # affine residual, a single step is exact
+                x_opt = np.linalg.lstsq(
+                    jac_opt, -resid_opt(x_opt), rcond=None)[0]
+                return x_wec, x_opt
+            with self._cached_excitation():
+                resid_norm = np.linalg.norm(resid_opt(x_opt))
+                for _ in range(3):
+                    step = np.linalg.lstsq(
+                        jacobian(resid_opt)(x_opt), -resid_opt(x_opt),
+                        rcond=None)[0]
+                    resid_norm_new = np.linalg.norm(resid_opt(x_opt + step))
+                    if not resid_norm_new < resid_norm:
+                        break
+                    x_opt = x_opt + step
+                    resid_norm = resid_norm_new
+        return x_wec, x_opt
+
+    def _warm_start_state(self,
+        result: OptimizeResult,
+        nstate_opt: int,
+        fourier_opt: Optional[bool],
+    ) -> Optional[ndarray]:
+        """Unscaled decision variable from a previous result, mapped to
+        the frequencies of this WEC, including :python:`x_opt` if
+        :python:`fourier_opt` is :python:`True`.
+
+        Returns :python:`None` if it cannot be mapped to the size of
+        the decision variable.
+        """
+        f1 = getattr(result, 'f1', self.f1)
+        nfreq = getattr(result, 'nfreq', self.nfreq)
+        ndof = self.ndof
+        x_wec, x_opt = decompose_state(np.asarray(result.x), ndof, nfreq)
+        if np.isclose(f1, self.f1) and (nfreq == self.nfreq):
+            state = np.concatenate([x_wec, x_opt])
+        else:
+            x_wec = regrid_state(x_wec, f1, nfreq, self.f1, self.nfreq)
+            if fourier_opt and (x_opt.size > 0):
+                x_opt = regrid_state(x_opt, f1, nfreq, self.f1, self.nfreq)
+            state = np.concatenate([x_wec, x_opt])
+        if state.size != self.nstate_wec + nstate_opt:
+            _log.warning(
+                "Warm start result does not match the size of the " +
+                "decision variable, it is ignored.")
+            return None
+        return state
+
+    def _residual_transfer_mat(self,
+        x_opt: ndarray,
+        waves: Dataset,
+    ) -> MIMOTransferMatrix:
+        """Per-frequency transfer matrix of the residual, in the state
+        representation, with respect to :python:`x_wec`.
+
+        The residual must be affine in :python:`x_wec` and only couple
+        components of the same frequency, e.g. for linear
+        time-invariant forces.
+        Each column is obtained from the response to unit amplitudes at
+        all frequencies of one degree of freedom.
+
+        Raises
+        ------
+        ValueError
+            If the residual does not have this structure, or if the
+            transfer matrix is singular or ill-conditioned.
+        """
+        ndof = self.ndof
+
+        def resid_state(x_wec):
+            resid = self.vec_to_dofmat(self.residual(x_wec, x_opt, waves))
+            return complex_to_real(td_to_fd(resid))
+
+        # response to unit cosine components, [X0, Re(X1), ..., Re(Xn)]
+        resid_0 = resid_state(np.zeros(self.nstate_wec))
+        unit = np.zeros(self.ncomponents)
+        unit[0] = 1.0
+        unit[1::2] = 1.0
+        transfer_mat = np.zeros((self.nfreq+1, ndof, ndof), dtype=complex)
+        for idof in range(ndof):
+            x_wec = np.zeros((self.ncomponents, ndof))
+            x_wec[:, idof] = unit
+            resp = resid_state(self.dofmat_to_vec(x_wec)) - resid_0
+            transfer_mat[:, :, idof] = real_to_complex(resp)
+        transfer_mat = MIMOTransferMatrix(transfer_mat)
+
+        # check the structure with an arbitrary state
+        x_wec = np.random.default_rng(0).standard_normal(self.nstate_wec)
+        resp = self.dofmat_to_vec(resid_state(x_wec) - resid_0)
+        error = np.max(np.abs(transfer_mat @ x_wec - resp))
+        if error > 1e-8*np.max(np.abs(resp)):
+            raise ValueError(
+                "The residual is not affine and time-invariant with " +
+                "respect to 'x_wec', 'reduced_space' cannot be used.")
+
+        # condition number, over all frequencies
+        sing = np.linalg.svd(transfer_mat.transfer_mat, compute_uv=False)
+        cond = np.inf
+        if np.min(sing) > 0:
+            cond = np.max(sing) / np.min(sing)
+        if cond > _max_condition_number:
+            ifreq = np.argmin(np.min(sing, axis=1))
+            raise ValueError(
+                "The dynamics are singular with respect to 'x_wec' " +
+                f"(condition number {cond:.2e}) at frequency " +
+                f"{self.frequency[ifreq]:.4g} Hz, " +
+                "'reduced_space' cannot be used.")
+        return transfer_mat
+
     # solve
     def solve(self,
         waves: Dataset,
@@ -606,14 +976,31 @@ class WEC:
         x_wec_0: Optional[ndarray] = None,
         x_opt_0: Optional[ndarray] = None,
         scale_x_wec: Optional[list] = None,
-        scale_x_opt: Optional[FloatOrArray] = 1.0,
-        scale_obj: Optional[float] = 1.0,
+        scale_x_opt: Optional[FloatOrArray] = None,
+        scale_obj: Optional[float] = None,
         optim_options: Optional[Mapping[str, Any]] = {},
         use_grad: Optional[bool] = True,
         maximize: Optional[bool] = False,
         bounds_wec: Optional[Bounds] = None,
         bounds_opt: Optional[Bounds] = None,
         callback: Optional[TStateFunction] = None,
+        affine_residual: Optional[bool] = None,
+        njobs: Optional[int] = 1,
+        quadratic_objective: Optional[bool] = False,
+        reduced_space: Optional[bool] = False,
+        initial_guess: Optional[str] = 'conjugate',
+        warm_start: Optional[Union[str, list[OptimizeResult]]] = None,
+        nfreq_coarse: Optional[Union[int, Iterable[int]]] = None,
+        fourier_opt: Optional[bool] = None,
+        auto_scale: Optional[bool] = False,
+        method: Optional[Union[str, Callable]] = 'SLSQP',
+        use_hess: Optional[bool] = False,
+        time_limit: Optional[float] = None,
+        max_nfev: Optional[int] = None,
+        feasibility_tol: Optional[float] = 1e-6,
+        checkpoint: Optional[Union[str, Path]] = None,
+        checkpoint_interval: Optional[int] = 10,
+        resume_from: Optional[Union[str, Path]] = None,
         ) -> list[OptimizeResult]:
         """Simulate WEC dynamics using a pseudo-spectral solution
         method and returns the raw results dictionary produced by
@@ -632,21 +1019,29 @@ class WEC:
             Length of the optimization (controls) state vector.
         x_wec_0
             Initial guess for the WEC dynamics state.
-            If :python:`None` it is randomly initiated.
+            If :python:`None` it is obtained from
+            :python:`initial_guess` for each wave realization.
         x_opt_0
             Initial guess for the optimization (control) state.
-            If :python:`None` it is randomly initiated.
+            If :python:`None` it is obtained from
+            :python:`initial_guess` for each wave realization.
         scale_x_wec
             Factor(s) to scale each DOF in :python:`x_wec` by, to
             improve convergence.
             A single float or an array of size :python:`ndof`.
+            If :python:`None` (default), :python:`1.0` or derived from
+            the problem, see :python:`auto_scale`.
         scale_x_opt
             Factor(s) to scale :python:`x_opt` by, to improve
             convergence.
             A single float or an array of size :python:`nstate_opt`.
+            If :python:`None` (default), :python:`1.0` or derived from
+            the problem, see :python:`auto_scale`.
         scale_obj
             Factor to scale :python:`obj_fun` by, to improve
             convergence.
+            If :python:`None` (default), :python:`1.0` or derived from
+            the problem, see :python:`auto_scale`.
         optim_options
             Optimization options passed to the optimizer.
             See :py:func:`scipy.optimize.minimize`.
@@ -669,15 +1064,273 @@ class WEC:
             :python:`fun(wec, x_wec, x_opt, waves)`. The default
             provides status reports at each iteration via logging at the
             INFO level.
+        affine_residual
+            Whether the residual of the dynamics
+            (:py:meth:`wecopttool.WEC.residual`) is affine in the
+            decision variable, i.e. all forces are linear in
+            :python:`x_wec` and :python:`x_opt`.
+            This is the case, for instance, for the linear hydrodynamic
+            forces and a PTO with linear kinematics and an unstructured
+            controller (:py:func:`wecopttool.pto.controller_unstructured`).
+            If :python:`True` the Jacobian of the dynamics equality
+            constraint is constant and is computed only once per call.
+            If :python:`None` it is set to :python:`True` only if all
+            forces are :py:class:`wecopttool.LinearForce` or
+            :py:class:`wecopttool.ExcitationForce` objects, or if
+            :python:`quadratic_objective` is :python:`True`.
+        njobs
+            Number of wave realizations to solve in parallel, in
+            separate processes.
+            See :py:class:`joblib.Parallel`, e.g. :python:`-1` uses all
+            CPUs.
+            Each process is limited to a single BLAS thread.
+            The results are the same as when solving serially
+            (:python:`njobs=1`, default) and in the same order.
+            The WEC, objective function and callback must be
+            serializable by :py:mod:`joblib`.
+        quadratic_objective
+            Whether the scaled objective function is quadratic in the
+            decision variable, e.g.
+            :py:meth:`wecopttool.pto.PTO.average_power` for a PTO
+            without losses, with linear kinematics and an unstructured
+            controller.
+            If :python:`True`, and the residual is affine (see
+            :python:`affine_residual`, assumed if :python:`None`), the
+            problem is a quadratic program and is solved directly from
+            its optimality (KKT) conditions, without iterations of the
+            optimizer.
+            If :python:`affine_residual` is :python:`None` it is set to
+            :python:`True`, without checking the forces.
+            Bounds are handled with an active-set method.
+            The optimizer is used instead if there are constraints, if
+            the quadratic program is unbounded, or if the active-set
+            method does not converge.
+        reduced_space
+            Whether to eliminate the WEC dynamics state from the
+            optimization problem.
+            Requires the residual to be affine in :python:`x_wec`, with
+            a constant Jacobian that does not depend on
+            :python:`x_opt`, e.g. linear hydrodynamics and a PTO force
+            that only depends on :python:`x_opt`.
+            The Jacobian must also be block-diagonal in frequency, as
+            for linear time-invariant forces, and well-conditioned.
+            Then :python:`x_wec` is obtained from :python:`x_opt` by
+            solving the dynamics independently at each frequency, and
+            the optimizer only varies
+            :python:`x_opt`, without the dynamics equality constraint.
+            The objective function and constraints can be nonlinear.
+            Bounds on :python:`x_wec` become inequality constraints.
+            A warning is logged if the dynamics are not satisfied at the
+            solution.
+        initial_guess
+            Strategy for the initial guess when :python:`x_wec_0` or
+            :python:`x_opt_0` are not provided.
+            The WEC motion is computed for each wave realization from
+            the intrinsic impedance (combined inertia and
+            :py:class:`wecopttool.LinearForce` forces) and the
+            :py:class:`wecopttool.ExcitationForce` forces, for a
+            PTO with:
+            :python:`'conjugate'` (default) complex-conjugate control,
+            :python:`'passive'` the optimal passive damping at the
+            frequency of largest excitation, or
+            :python:`'free'` no force (free response).
+            :python:`x_opt` is then the least-squares fit of the
+            dynamics for this motion, i.e. it is projected onto the
+            controller's optimization state.
+            If :python:`affine_residual` is :python:`True` the fit
+            reuses the constant Jacobian of the dynamics, otherwise it
+            uses a few Gauss-Newton iterations.
+            :python:`'random'` uses normally distributed random
+            values, as do the other strategies if there are no linear
+            or excitation forces.
+            Initial guesses are only computed for the realizations that
+            do not start from a :python:`warm_start` or
+            :python:`resume_from` checkpoint.
+        warm_start
+            Start from previous solutions instead of
+            :python:`x_wec_0`, :python:`x_opt_0` or
+            :python:`initial_guess`.
+            If :python:`'previous'`, each wave realization starts from
+            the solution of the previous realization.
+            This requires :python:`njobs=1`.
+            If a list of results, e.g. from a previous call, each
+            realization starts from the result with the same index (the
+            last one if there are fewer results).
+            Results obtained with a different fundamental frequency or
+            number of frequencies are mapped to this WEC's frequencies
+            with :py:func:`wecopttool.regrid_state`, including
+            :python:`x_opt` if :python:`fourier_opt` is :python:`True`.
+            Results that cannot be mapped to the size of the decision
+            variable are ignored.
+        nfreq_coarse
+            Number(s) of frequencies of coarser grids to solve on first,
+            as a coarse-to-fine continuation.
+            The problem is solved for the first :python:`nfreq_coarse`
+            frequencies (see :py:meth:`wecopttool.WEC.truncate`), and
+            the solution is zero-padded to warm start the solve on the
+            next finer grid, up to the full number of frequencies.
+            The forces, :python:`obj_fun`, :python:`callback` and
+            constraints are truncated as in
+            :py:meth:`wecopttool.WEC.truncate`, and must otherwise
+            support any number of frequencies.
+            Requires :python:`fourier_opt`.
+            All other arguments are the same for every grid.
+            Values not smaller than the number of frequencies are
+            ignored.
+            This reduces the total number of iterations for large
+            numbers of frequencies.
+        fourier_opt
+            Whether :python:`x_opt` is in the same Fourier
+            representation as :python:`x_wec`, i.e. blocks of
+            :python:`2*nfreq` components, e.g. for
+            :py:func:`wecopttool.pto.controller_unstructured`.
+            If :python:`True`, :python:`x_opt` and its scale, bounds and
+            initial guess are truncated for :python:`nfreq_coarse`, and
+            :python:`x_opt` of a :python:`warm_start` on a different
+            frequency grid is regridded.
+            Otherwise they are used as they are.
+            Must be provided with :python:`nfreq_coarse`.
+        auto_scale
+            Whether to derive the scale factors that are not provided,
+            i.e. those of :python:`scale_x_wec`, :python:`scale_x_opt`
+            and :python:`scale_obj` that are :python:`None`, from the
+            problem.
+            Scale factors that are provided take precedence and are
+            used as they are.
+            The scale factors of a :python:`resume_from` checkpoint take
+            precedence over both.
+            The reference state of each wave realization is the
+            :python:`'conjugate'` :python:`initial_guess`, i.e. the
+            response to the excitation of the realization obtained from
+            the intrinsic impedance, or the initial guess if there are
+            no linear or excitation forces.
+            Realizations with a :python:`warm_start` use it as the
+            reference state instead, and those started from the
+            :python:`'previous'` solution have none.
+            Each DOF of :python:`x_wec` and all of :python:`x_opt` are
+            scaled so that the largest component of the reference
+            states is one.
+            The objective function is then scaled so that the largest
+            component of its gradient with respect to the scaled
+            decision variable, including provided scale factors, at
+            the reference states, is one.
+            The same scale factors are used for all realizations.
+        method
+            Optimization method, see :py:func:`scipy.optimize.minimize`.
+            The default is :python:`'SLSQP'`, which uses dense
+            Jacobians.
+            For :python:`'trust-constr'` the dynamics equality
+            constraint of an affine residual (see
+            :python:`affine_residual`) is a
+            :py:class:`scipy.optimize.LinearConstraint`, which does not
+            contribute to the Hessian of the Lagrangian. The residual is
+            evaluated in the time domain, so its Jacobian is dense.
+            A callable is used as a custom method, see
+            :py:func:`scipy.optimize.minimize`.
+            In all cases the :python:`jac` entry of the results is the
+            gradient of the objective function.
+        use_hess
+            If :python:`True`, second-order methods (e.g.
+            :python:`'trust-constr'`, :python:`'trust-ncg'`, or a
+            callable :python:`method`) are given the exact Hessian of
+            the objective function from
+            `autograd <https://github.com/HIPS/autograd>`_, as
+            Hessian-vector products if the method accepts them.
+            If :python:`quadratic_objective` is :python:`True` the
+            Hessian is constant and is computed only once.
+            For :python:`'trust-constr'` the nonlinear constraints,
+            including the dynamics if the residual is not affine, are
+            also given the exact Hessian of their contribution to the
+            Lagrangian.
+            Other methods, e.g. :python:`'SLSQP'`, do not use Hessians
+            and ignore this option.
+        time_limit
+            Wall-clock time limit, in seconds, of the optimizer for
+            each wave realization.
+            If :python:`None` (default) there is no time limit.
+            When the time limit or :python:`max_nfev` is reached, the
+            optimizer is stopped and the best iterate so far is
+            returned, with :python:`success` :python:`False` and a
+            warning instead of an exception.
+            The best iterate is the feasible iterate with the lowest
+            objective function, or the iterate with the lowest
+            constraint violation if none is feasible.
+            With a budget, the results include the maximum constraint
+            violation of the returned iterate, :python:`maxcv`, and
+            whether the budget was exhausted,
+            :python:`budget_exhausted`.
+            The closed-form solution of a
+            :python:`quadratic_objective` is not limited.
+        max_nfev
+            Maximum number of objective function evaluations of the
+            optimizer for each wave realization, see
+            :python:`time_limit`.
+            If :python:`None` (default) there is no limit.
+        feasibility_tol
+            Maximum violation of the constraints, including the
+            dynamics and bounds, for an iterate to be considered
+            feasible when selecting the best iterate, see
+            :python:`time_limit`.
+        checkpoint
+            File to periodically save the progress of the solve to, with
+            :py:mod:`pickle`, so that it can be resumed with
+            :python:`resume_from`.
+            The checkpoint contains the results of the finished wave
+            realizations, the current iterate and realization, and the
+            scale factors.
+            It is written every :python:`checkpoint_interval`
+            iterations of the optimizer and after each realization.
+            Requires :python:`njobs=1`.
+        checkpoint_interval
+            Number of iterations of the optimizer between checkpoints,
+            see :python:`checkpoint`.
+        resume_from
+            Checkpoint file, see :python:`checkpoint`, to resume a solve
+            from, with the same arguments.
+            The realizations that finished are not solved again and
+            their saved results are returned, and the optimizer starts
+            the unfinished realization from its saved iterate.
+            The saved scale factors are used instead of the arguments
+            and :python:`auto_scale`.
+            This can be the same file as :python:`checkpoint`.
+            Requires :python:`njobs=1`.
 
         Raises
         ------
         ValueError
             If :python:`scale_x_opt` is a scalar and
             :python:`nstate_opt` is not provided.
+        ValueError
+            If :python:`quadratic_objective` is :python:`True` and
+            :python:`affine_residual` is :python:`False`.
+        ValueError
+            If :python:`initial_guess` is not a valid strategy.
+        ValueError
+            If :python:`warm_start` is :python:`'previous'` and
+            :python:`njobs` is not :python:`1`.
+        ValueError
+            If both :python:`warm_start` and :python:`nfreq_coarse` are
+            provided.
+        ValueError
+            If :python:`nfreq_coarse` is provided without
+            :python:`fourier_opt`, or if the forces, objective function
+            or constraints do not support the coarse grid.
+        ValueError
+            If :python:`checkpoint` or :python:`resume_from` is provided
+            and :python:`njobs` is not :python:`1`.
+        ValueError
+            If the :python:`resume_from` checkpoint is for a different
+            frequency grid or size of the decision variable.
+        ValueError
+            If :python:`reduced_space` is :python:`True` and the
+            Jacobian of the residual with respect to :python:`x_wec` is
+            not block-diagonal in frequency, or is singular or
+            ill-conditioned.
         Exception
             If the optimizer fails for any reason other than maximum
-            number of states, i.e. for exit modes other than 0 or 9.
+            number of iterations or an exhausted :python:`time_limit`
+            or :python:`max_nfev`, e.g. for :python:`'SLSQP'` for exit
+            modes other than 0 or 9.
             See :py:mod:`scipy.optimize` for exit mode details.
 
         Examples
@@ -704,7 +1357,51 @@ class WEC:
         wecopttool.core.pto.post_process,
         """
 
-        results = []
+        # coarse-to-fine continuation, warm start from the coarser grids
+        if nfreq_coarse is not None:
+            if warm_start is not None:
+                raise ValueError(
+                    "'warm_start' and 'nfreq_coarse' cannot be combined.")
+            if fourier_opt is None:
+                raise ValueError(
+                    "'nfreq_coarse' requires 'fourier_opt', whether " +
+                    "'x_opt' is truncated with the frequencies.")
+            levels = sorted({int(n) for n in np.atleast_1d(nfreq_coarse)
+                             if n < self.nfreq})
+            if levels:
+                warm_start = self._solve_coarse(
+                    levels[-1], waves, nstate_opt, x_wec_0, x_opt_0,
+                    scale_x_opt, bounds_wec, bounds_opt, fourier_opt,
+                    obj_fun=obj_fun,
+                    scale_x_wec=scale_x_wec,
+                    scale_obj=scale_obj,
+                    optim_options=dict(optim_options),
+                    use_grad=use_grad,
+                    maximize=maximize,
+                    callback=callback,
+                    affine_residual=affine_residual,
+                    njobs=njobs,
+                    quadratic_objective=quadratic_objective,
+                    reduced_space=reduced_space,
+                    initial_guess=initial_guess,
+                    nfreq_coarse=levels[:-1],
+                    auto_scale=auto_scale,
+                    method=method,
+                    use_hess=use_hess,
+                    time_limit=time_limit,
+                    max_nfev=max_nfev,
+                    feasibility_tol=feasibility_tol,
+                )
+
+        # scale factors to derive from the problem, see 'auto_scale'
+        auto = [scale_x_wec is None, scale_x_opt is None, scale_obj is None]
+        if auto_scale and not any(auto):
+            _log.warning("All scale factors are provided, 'auto_scale' " +
+                         "has no effect.")
+        if scale_x_opt is None:
+            scale_x_opt = 1.0
+        if scale_obj is None:
+            scale_obj = 1.0
 
         # x_wec scaling vector
         if scale_x_wec is None:
@@ -723,12 +1420,123 @@ class WEC:
         # composite scaling vector
         scale = np.concatenate([scale_x_wec, scale_x_opt])
 
-        # decision variable initial guess
-        if x_wec_0 is None:
-            x_wec_0 = np.random.randn(self.nstate_wec)
-        if x_opt_0 is None:
-            x_opt_0 = np.random.randn(nstate_opt)
-        x0 = np.concatenate([x_wec_0, x_opt_0])*scale
+        # wave realizations
+        realizations = []
+        for realization, wave in waves.groupby('realization'):
+            try:
+                wave = wave.squeeze(dim='realization')
+            except KeyError:
+                pass
+            realizations.append((realization, wave))
+        if initial_guess not in _initial_guess_strategies:
+            raise ValueError(
+                f"Unknown initial guess '{initial_guess}', must be one " +
+                f"of {_initial_guess_strategies}.")
+        if (warm_start == 'previous') and (njobs != 1):
+            raise ValueError(
+                "A 'previous' warm start requires solving serially, " +
+                "'njobs=1'.")
+
+        # resume from a checkpoint, with its scale factors
+        if ((checkpoint is not None) or (resume_from is not None)) and (
+                njobs != 1):
+            raise ValueError(
+                "Checkpoints require solving serially, 'njobs=1'.")
+        state = None
+        if resume_from is not None:
+            state = _Checkpoint.load(resume_from)
+            if ((state['f1'], state['nfreq']) != (self.f1, self.nfreq)) or (
+                    len(state['scale']) != len(scale)):
+                raise ValueError(
+                    f"The checkpoint '{resume_from}' is for a different " +
+                    "frequency grid or size of the decision variable.")
+            _log.info(f"Resuming from checkpoint '{resume_from}', with " +
+                      f"{len(state['results'])} finished realizations.")
+            scale, scale_obj = state['scale'], state['scale_obj']
+            auto_scale = False
+
+        # affine dynamics, with a constant Jacobian computed once
+        if quadratic_objective and (affine_residual is None):
+            affine_residual = True
+        elif quadratic_objective and not affine_residual:
+            raise ValueError(
+                "'quadratic_objective' requires an affine residual.")
+        if affine_residual is None:
+            affine_residual = all(
+                isinstance(f, (LinearForce, ExcitationForce))
+                for f in self.forces.values())
+        jac_cache = []
+
+        def residual_jac():
+            if not jac_cache:
+                wave = realizations[0][1]
+
+                def resid_fun(x):
+                    x_wec, x_opt = self.decompose_state(x)
+                    return self.residual(x_wec, x_opt, wave)
+
+                x_zero = np.zeros(self.nstate_wec + nstate_opt)
+                jac_cache.append(jacobian(resid_fun)(x_zero))
+            return jac_cache[0]
+
+        def residual_jac_opt():
+            return residual_jac()[:, self.nstate_wec:]
+
+        # initial guesses, only computed when used
+        guesses = {}
+
+        def guess(i, strategy):
+            key = 'random' if (strategy == 'random') else (i, strategy)
+            if key not in guesses:
+                guesses[key] = self._initial_guess(
+                    realizations[i][1], nstate_opt, strategy,
+                    residual_jac_opt if affine_residual else None)
+            return guesses[key]
+
+        # decision variable, from a warm start or initial guess
+        x0_list = [None] * len(realizations)
+        if isinstance(warm_start, (list, tuple)):
+            for i in range(len(x0_list)):
+                res = warm_start[min(i, len(warm_start)-1)]
+                x0_list[i] = self._warm_start_state(
+                    res, nstate_opt, fourier_opt)
+        warm = [x0 is not None for x0 in x0_list]
+        finished = {} if (state is None) else state['results']
+        for i, (realization, _) in enumerate(realizations):
+            resumed = (state is not None) and (state['x'] is not None) and (
+                realization == state['realization'])
+            previous = (warm_start == 'previous') and (i > 0)
+            if (x0_list[i] is not None) or resumed or previous or (
+                    realization in finished):
+                continue
+            x_wec_i, x_opt_i = x_wec_0, x_opt_0
+            if (x_wec_0 is None) or (x_opt_0 is None):
+                x_wec_guess, x_opt_guess = guess(i, initial_guess)
+                x_wec_i = x_wec_guess if (x_wec_0 is None) else x_wec_0
+                x_opt_i = x_opt_guess if (x_opt_0 is None) else x_opt_0
+            x0_list[i] = np.concatenate([x_wec_i, x_opt_i])
+
+        # scale factors from the complex-conjugate control response, or
+        # from the warm start, the realizations started from the previous
+        # solution are not needed
+        if auto_scale:
+            intrinsic, excitation, _ = self._fused_forces()
+            conjugate = (intrinsic is not None) and (excitation is not None)
+            ref = []
+            for i, rw in enumerate(realizations):
+                if conjugate and not warm[i] and (x0_list[i] is not None):
+                    ref.append((rw, np.concatenate(guess(i, 'conjugate'))))
+                elif x0_list[i] is not None:
+                    ref.append((rw, x0_list[i]))
+            scale, scale_obj = self._auto_scale(
+                [rw for rw, _ in ref], [x for _, x in ref], obj_fun,
+                use_grad, scale, scale_obj, auto)
+        x0_list = [None if (x0 is None) else x0*scale for x0 in x0_list]
+        if (state is not None) and (state['x'] is not None):
+            for i, (realization, _) in enumerate(realizations):
+                if realization == state['realization']:
+                    x0_list[i] = state['x']
+        wave = realizations[0][1]
 
         # bounds
         if (bounds_wec is None) and (bounds_opt is None):
@@ -753,105 +1561,547 @@ class WEC:
             bounds = Bounds(lb=np.hstack([le.lb for le in bounds_list])*scale,
                             ub=np.hstack([le.ub for le in bounds_list])*scale)
 
-        for realization, wave in waves.groupby('realization'):
+        # constant dynamics Jacobian, of the scaled residual
+        resid_jac = None
+        if affine_residual and (use_grad or quadratic_objective):
+            resid_jac = residual_jac() / scale
+
+        # inverse of the constant dynamics Jacobian with respect to x_wec
+        resid_wec_inv = None
+        if reduced_space:
+            resid_wec_inv = self._residual_transfer_mat(
+                np.zeros(nstate_opt), wave).inv()
+
+        optim_options['disp'] = optim_options.get('disp', True)
+        if isinstance(method, str):
+            method = method.lower()
+        solve_kwargs = {
+            'obj_fun': obj_fun,
+            'scale': scale,
+            'scale_obj': scale_obj,
+            'optim_options': optim_options,
+            'use_grad': use_grad,
+            'maximize': maximize,
+            'bounds': bounds,
+            'callback': callback,
+            'resid_jac': resid_jac,
+            'quadratic_objective': quadratic_objective,
+            'resid_wec_inv': resid_wec_inv,
+            'method': method,
+            'use_hess': use_hess,
+            'time_limit': time_limit,
+            'max_nfev': max_nfev,
+            'feasibility_tol': feasibility_tol,
+        }
+        if njobs == 1:
+            saver = None
+            if checkpoint is not None:
+                saver = _Checkpoint(
+                    checkpoint, checkpoint_interval, self.f1, self.nfreq,
+                    scale, scale_obj, state)
+            resumed = None
+            if (state is not None) and (state['x'] is not None):
+                resumed = state['realization']
+            results = []
+            for (realization, wave), x0 in zip(realizations, x0_list):
+                if realization in finished:
+                    results.append(finished[realization])
+                    continue
+                if (warm_start == 'previous') and results and (
+                        realization != resumed):
+                    x0 = results[-1].x*scale
+                results.append(self._solve_realization(
+                    realization, wave, x0, checkpoint=saver, **solve_kwargs))
+                if saver is not None:
+                    saver.finished(realization, results[-1])
+        else:
+            # one BLAS thread per worker to avoid oversubscription
+            with parallel_backend('loky', inner_max_num_threads=1):
+                results = Parallel(n_jobs=njobs)(
+                    delayed(self._solve_realization)(
+                        realization, wave, x0, checkpoint=None,
+                        **solve_kwargs)
+                    for (realization, wave), x0 in zip(realizations, x0_list)
+                )
 
-            _log.info("Solving pseudo-spectral control problem "
-                      + f"for realization number {realization}.")
+        return results
 
-            try:
-                wave = wave.squeeze(dim='realization')
-            except KeyError:
-                pass
-                      
-            # objective function
-            sign = -1.0 if maximize else 1.0
+    def _auto_scale(self,
+        realizations: list[tuple[Any, Dataset]],
+        x_ref: list[ndarray],
+        obj_fun: TStateFunction,
+        use_grad: bool,
+        scale: ndarray,
+        scale_obj: float,
+        auto: list[bool],
+    ) -> tuple[ndarray, float]:
+        """Scale factors of the decision variable and objective function
+        from unscaled reference states, one per realization, see the
+        :python:`auto_scale` argument of :py:meth:`wecopttool.WEC.solve`.
+
+        Only the factors of :python:`[x_wec, x_opt, obj]` for which
+        :python:`auto` is :python:`True` are derived, the others are
+        taken from :python:`scale` and :python:`scale_obj`.
+        """
+        auto_wec, auto_opt, auto_obj = auto
+        nstate_wec = self.nstate_wec
+        x_max = np.max(np.abs(np.stack(x_ref)), axis=0)
+        scale = np.array(scale, dtype=float)
+        if auto_wec:
+            wec_max = np.max(self.vec_to_dofmat(x_max[:nstate_wec]), axis=0)
+            scale_x_wec = [1/value if value > 0 else 1.0 for value in wec_max]
+            scale[:nstate_wec] = scale_dofs(scale_x_wec, self.ncomponents)
+        if auto_opt:
+            opt_max = np.max(x_max[nstate_wec:], initial=0.0)
+            scale[nstate_wec:] = 1/opt_max if opt_max > 0 else 1.0
+
+        def obj_fun_x(x):
+            x_wec, x_opt = self.decompose_state(x)
+            return obj_fun(self, x_wec, x_opt, wave)
+
+        if auto_obj:
+            obj_max = 0.0
+            with self._cached_excitation():
+                for (_, wave), x in zip(realizations, x_ref):
+                    if use_grad:
+                        grad = value_and_grad(obj_fun_x)(x)[1]
+                        obj_max = max(obj_max, np.max(np.abs(grad/scale)))
+                    else:
+                        obj_max = max(obj_max, np.abs(obj_fun_x(x)))
+            scale_obj = 1/obj_max if obj_max > 0 else 1.0
+        scale_x_wec = self.vec_to_dofmat(scale[:nstate_wec])[0]
+        _log.info("Automatic scaling, [scale_x_wec, scale_x_opt, " +
+                  f"scale_obj]: [{scale_x_wec}, " +
+                  f"{np.max(scale[nstate_wec:], initial=1.0):.2e}, " +
+                  f"{scale_obj:.2e}]")
+        return scale, scale_obj
+
+    def _tighten_aggregated(self,
+        optim_res: OptimizeResult,
+        problem: Mapping[str, Any],
+        to_full: Callable[[ndarray], ndarray],
+        scale: ndarray,
+        wave: Dataset,
+        budget: Optional[_SolveBudget],
+    ) -> OptimizeResult:
+        """Check the constraints created with
+        :py:func:`wecopttool.aggregate_constraint` exactly at the
+        solution, and solve again with larger aggregation parameters
+        while the aggregation is too conservative and the optimizer
+        succeeded.
+        """
+        aggregated = [icons['fun'] for icons in self.constraints
+                      if isinstance(icons['fun'], _AggregatedConstraint)]
+        if not aggregated:
+            return optim_res
+        parameters = [agg.parameter for agg in aggregated]
+        nupdates = [0] * len(aggregated)
+        try:
+            while True:
+                x_wec, x_opt = self.decompose_state(
+                    to_full(optim_res.x) / scale)
+                tighten = False
+                for i, agg in enumerate(aggregated):
+                    tol = agg.rtol * agg.scale
+                    exact = np.min(agg.exact(self, x_wec, x_opt, wave))
+                    active = np.min(agg(self, x_wec, x_opt, wave)) < tol
+                    if active and (exact > tol) and (
+                            nupdates[i] < agg.max_updates):
+                        agg.parameter *= 2
+                        nupdates[i] += 1
+                        tighten = True
+                if not (tighten and optim_res.success):
+                    break
+                _log.info("Aggregated constraints are conservative, " +
+                          "solving with larger aggregation parameters.")
+                nit, nfev = optim_res.nit, optim_res.nfev
+                optim_res = _minimize({**problem, 'x0': optim_res.x}, budget)
+                if not optim_res.get('budget_exhausted', False):
+                    optim_res.nit += nit
+                    optim_res.nfev += nfev
+            for agg in aggregated:
+                exact = np.min(agg.exact(self, x_wec, x_opt, wave))
+                if exact < -1*agg.rtol*agg.scale:
+                    _log.warning(
+                        "An aggregated constraint is violated at the " +
+                        f"solution, minimum value {exact:.2e}.")
+        finally:
+            for agg, parameter in zip(aggregated, parameters):
+                agg.parameter = parameter
+        return optim_res
+
+    def _solve_coarse(self,
+        nfreq: int,
+        waves: Dataset,
+        nstate_opt: int,
+        x_wec_0: Optional[ndarray],
+        x_opt_0: Optional[ndarray],
+        scale_x_opt: FloatOrArray,
+        bounds_wec: Optional[Union[Bounds, tuple]],
+        bounds_opt: Optional[Union[Bounds, tuple]],
+        fourier_opt: bool,
+        **kwargs,
+    ) -> list[OptimizeResult]:
+        """Solve the problem restricted to the first :python:`nfreq`
+        frequencies, see the :python:`nfreq_coarse` argument of
+        :py:meth:`wecopttool.WEC.solve`.
+
+        The remaining keyword arguments are passed to
+        :py:meth:`wecopttool.WEC.solve`.
+        """
+        _log.info("Solving pseudo-spectral control problem on the " +
+                  f"coarse grid with {nfreq} frequencies.")
+        ncomp = self.ncomponents
+
+        def coarse_wec(vec):
+            return _truncate_components(vec, self.nfreq, nfreq)
+
+        def coarse_opt(vec):
+            return coarse_wec(vec) if fourier_opt else vec
+
+        def coarse_bounds(bounds, coarse):
+            if bounds is None:
+                return None
+            if isinstance(bounds, tuple):
+                bounds = Bounds(lb=[xibs[0] for xibs in bounds],
+                                ub=[xibs[1] for xibs in bounds])
+            lb, ub = np.asarray(bounds.lb), np.asarray(bounds.ub)
+            lb = coarse(lb) if lb.size > 1 else lb
+            ub = coarse(ub) if ub.size > 1 else ub
+            return Bounds(lb=lb, ub=ub)
+
+        if fourier_opt:
+            nstate_opt = nstate_opt // ncomp * ncomponents(nfreq)
+            if np.size(scale_x_opt) > 1:
+                scale_x_opt = coarse_opt(scale_x_opt)
+
+        # truncated problem, sharing truncated objects, e.g. a PTO
+        truncated = {}
+        wec = self._truncate(nfreq, truncated)
+        waves = waves.isel(omega=slice(0, nfreq))
+        for key in ['obj_fun', 'callback']:
+            if kwargs.get(key) is not None:
+                kwargs[key] = _truncate_function(kwargs[key], nfreq, truncated)
+
+        # check the problem can be evaluated on the coarse grid
+        wave = waves
+        if 'realization' in waves.dims:
+            wave = waves.isel(realization=0)
+        x_wec = np.zeros(wec.nstate_wec)
+        x_opt = np.zeros(nstate_opt)
+        try:
+            wec.residual(x_wec, x_opt, wave)
+            kwargs['obj_fun'](wec, x_wec, x_opt, wave)
+            for icons in wec.constraints:
+                icons['fun'](wec, x_wec, x_opt, wave)
+        except (ValueError, IndexError) as err:
+            raise ValueError(
+                "The forces, objective function and constraints must " +
+                f"support {nfreq} frequencies for 'nfreq_coarse', see " +
+                "'WEC.truncate'.") from err
+
+        return wec.solve(
+            waves,
+            nstate_opt=nstate_opt,
+            x_wec_0=None if (x_wec_0 is None) else coarse_wec(x_wec_0),
+            x_opt_0=None if (x_opt_0 is None) else coarse_opt(x_opt_0),
+            scale_x_opt=scale_x_opt,
+            bounds_wec=coarse_bounds(bounds_wec, coarse_wec),
+            bounds_opt=coarse_bounds(bounds_opt, coarse_opt),
+            fourier_opt=fourier_opt,
+            **kwargs,
+        )
+
+    def _solve_realization(self,
+        realization: Any,
+        wave: Dataset,
+        x0: ndarray,
+        *,
+        obj_fun: TStateFunction,
+        scale: ndarray,
+        scale_obj: float,
+        optim_options: Mapping[str, Any],
+        use_grad: bool,
+        maximize: bool,
+        bounds: Optional[Bounds],
+        callback: Optional[TStateFunction],
+        resid_jac: Optional[ndarray],
+        quadratic_objective: bool,
+        resid_wec_inv: Optional[MIMOTransferMatrix],
+        method: Union[str, Callable],
+        use_hess: bool,
+        time_limit: Optional[float],
+        max_nfev: Optional[int],
+        feasibility_tol: float,
+        checkpoint: Optional[_Checkpoint],
+    ) -> OptimizeResult:
+        """Solve the pseudo-spectral problem for a single wave
+        realization, see :py:meth:`wecopttool.WEC.solve`.
+
+        If :python:`resid_jac` is not :python:`None` it is used as the
+        constant Jacobian of the scaled dynamics residual.
+        If :python:`resid_wec_inv` is not :python:`None` it is the
+        inverse of the per-frequency transfer matrix of the residual
+        with respect to :python:`x_wec`, and the problem is solved in
+        the reduced space of :python:`x_opt`.
+        If :python:`checkpoint` is not :python:`None` the iterates are
+        saved to it periodically.
+        """
+        _log.info("Solving pseudo-spectral control problem "
+                  + f"for realization number {realization}.")
+
+        # objective function
+        sign = -1.0 if maximize else 1.0
 
-            def obj_fun_scaled(x):
-                x_wec, x_opt = self.decompose_state(x/scale)
-                return obj_fun(self, x_wec, x_opt, wave)*scale_obj*sign
+        def obj_fun_scaled(x):
+            x_wec, x_opt = self.decompose_state(x/scale)
+            return obj_fun(self, x_wec, x_opt, wave)*scale_obj*sign
 
-            # constraints
-            constraints = self.constraints.copy()
+        # constraints
+        constraints = self.constraints.copy()
 
-            for i, icons in enumerate(self.constraints):
-                icons_new = {"type": icons["type"]}
+        for i, icons in enumerate(self.constraints):
+            icons_new = {"type": icons["type"],
+                         "affine": icons.get("affine", False)}
 
-                def make_new_fun(icons):
-                    def new_fun(x):
-                        x_wec, x_opt = self.decompose_state(x/scale)
-                        return icons["fun"](self, x_wec, x_opt, wave)
-                    return new_fun
+            def make_new_fun(icons):
+                def new_fun(x):
+                    x_wec, x_opt = self.decompose_state(x/scale)
+                    return icons["fun"](self, x_wec, x_opt, wave)
+                return new_fun
 
-                icons_new["fun"] = make_new_fun(icons)
+            icons_new["fun"] = make_new_fun(icons)
+            if use_grad:
+                icons_new['jac'] = jacobian(icons_new['fun'])
+            constraints[i] = icons_new
+
+        # system dynamics through equality constraint, ma - Σf = 0
+        def scaled_resid_fun(x):
+            x_s = x/scale
+            x_wec, x_opt = self.decompose_state(x_s)
+            return self.residual(x_wec, x_opt, wave)
+
+        eq_cons = {'type': 'eq', 'fun': scaled_resid_fun}
+        if use_grad and resid_jac is not None:
+            eq_cons['jac'] = lambda x: resid_jac
+        elif use_grad:
+            eq_cons['jac'] = jacobian(scaled_resid_fun)
+        if (method == 'trust-constr') and (resid_jac is not None):
+            # affine dynamics, A x = -r(0)
+            resid_0 = scaled_resid_fun(x0) - np.dot(resid_jac, x0)
+            eq_cons = LinearConstraint(resid_jac, -resid_0, -resid_0)
+        constraints.append(eq_cons)
+
+        # decision variable of the optimizer
+        if resid_wec_inv is None:
+            def to_full(z):
+                return z
+            fun_opt = obj_fun_scaled
+            z0 = x0
+            bounds_z = bounds
+        else:
+            # reduced space, x_wec from the linear dynamics
+            nstate_wec = self.nstate_wec
+            scale_wec = scale[:nstate_wec]
+            scale_opt = scale[nstate_wec:]
+
+            def to_full(z):
+                x_opt = z / scale_opt
+                resid_0 = self.vec_to_dofmat(
+                    self.residual(np.zeros(nstate_wec), x_opt, wave))
+                resid_0 = self.dofmat_to_vec(
+                    complex_to_real(td_to_fd(resid_0)))
+                x_wec = -1 * (resid_wec_inv @ resid_0)
+                return np.concatenate([x_wec*scale_wec, z])
+
+            def fun_opt(z):
+                return obj_fun_scaled(to_full(z))
+
+            def make_reduced_fun(fun):
+                def reduced_fun(z):
+                    return fun(to_full(z))
+                return reduced_fun
+
+            # replace the dynamics with the bounds on x_wec
+            constraints_full = constraints[:-1]
+            if bounds is not None:
+                lb_wec = bounds.lb[:nstate_wec]
+                ub_wec = bounds.ub[:nstate_wec]
+                ilb = np.isfinite(lb_wec)
+                iub = np.isfinite(ub_wec)
+                if np.any(ilb):
+                    constraints_full.append({
+                        'type': 'ineq',
+                        'fun': lambda x: x[:nstate_wec][ilb] - lb_wec[ilb],
+                        'affine': True})
+                if np.any(iub):
+                    constraints_full.append({
+                        'type': 'ineq',
+                        'fun': lambda x: ub_wec[iub] - x[:nstate_wec][iub],
+                        'affine': True})
+            constraints = []
+            for icons in constraints_full:
+                icons_new = {"type": icons["type"],
+                             "affine": icons.get("affine", False)}
+                icons_new["fun"] = make_reduced_fun(icons["fun"])
                 if use_grad:
                     icons_new['jac'] = jacobian(icons_new['fun'])
-                constraints[i] = icons_new
-
-            # system dynamics through equality constraint, ma - Σf = 0
-            def scaled_resid_fun(x):
-                x_s = x/scale
+                constraints.append(icons_new)
+
+            z0 = x0[nstate_wec:]
+            bounds_z = None
+            if bounds is not None:
+                bounds_z = Bounds(lb=bounds.lb[nstate_wec:],
+                                  ub=bounds.ub[nstate_wec:])
+
+        # constant Jacobians of the affine constraints
+        if use_grad:
+            constraints = [
+                _affine_constraint(icons, z0, method)
+                if (isinstance(icons, dict) and icons.get('affine', False))
+                else icons
+                for icons in constraints]
+
+        # objective value and gradient from a single evaluation
+        objective = _MemoizedObjective(fun_opt, use_grad)
+
+        # callback
+        if callback is None:
+            def callback_scipy(z):
+                x_wec, x_opt = self.decompose_state(to_full(z))
+                max_x_opt = np.nan if np.size(x_opt)==0 else np.max(np.abs(x_opt))
+                _log.info("Scaled [max(x_wec), max(x_opt), obj_fun(x)]: "
+                          + f"[{np.max(np.abs(x_wec)):.2e}, "
+                          + f"{max_x_opt:.2e}, "
+                          + f"{objective.fun(z):.2e}]")
+        else:
+            def callback_scipy(z):
+                x_s = to_full(z)/scale
                 x_wec, x_opt = self.decompose_state(x_s)
-                return self.residual(x_wec, x_opt, wave)
-
-            eq_cons = {'type': 'eq', 'fun': scaled_resid_fun}
-            if use_grad:
-                eq_cons['jac'] = jacobian(scaled_resid_fun)
-            constraints.append(eq_cons)
-
-            # callback
-            if callback is None:
-                def callback_scipy(x):
-                    x_wec, x_opt = self.decompose_state(x)
-                    max_x_opt = np.nan if np.size(x_opt)==0 else np.max(np.abs(x_opt))
-                    _log.info("Scaled [max(x_wec), max(x_opt), obj_fun(x)]: "
-                              + f"[{np.max(np.abs(x_wec)):.2e}, "
-                              + f"{max_x_opt:.2e}, "
-                              + f"{obj_fun_scaled(x):.2e}]")
+                return callback(self, x_wec, x_opt, wave)
+
+        # time and evaluation budget, keeps the best iterate
+        budget = None
+        if (time_limit is not None) or (max_nfev is not None):
+            budget = _SolveBudget(
+                time_limit, max_nfev, feasibility_tol,
+                lambda z: _max_violation(constraints, bounds_z, z),
+                objective.jac if use_grad else None)
+            callback_user = callback_scipy
+
+            def callback_scipy(z):
+                budget.record(z, objective.fun(z))
+                budget.check()
+                return callback_user(z)
+
+        # periodic checkpoints of the iterate
+        if checkpoint is not None:
+            callback_save = callback_scipy
+
+            def callback_scipy(z):
+                checkpoint.iterate(realization, to_full(z))
+                return callback_save(z)
+
+        if method == 'trust-constr':
+            callback_z = callback_scipy
+
+            def callback_scipy(z, state):
+                return callback_z(z)
+
+        # optimization problem
+        problem = {'fun': objective.fun,
+                    'x0': z0,
+                    'method': method,
+                    'constraints': constraints,
+                    'options': optim_options,
+                    'bounds': bounds_z,
+                    'callback': callback_scipy,
+                    }
+        if use_grad:
+            problem['jac'] = objective.jac
+        if budget is not None:
+            problem['fun'] = budget.counted(objective.fun)
+            budget.record(z0, objective.fun(z0))
+
+        # exact second derivatives
+        if use_hess and (callable(method) or (method in _hess_methods)):
+            if quadratic_objective:
+                hess_obj = hessian(fun_opt)(z0)
+                problem['hess'] = lambda z: hess_obj
+            elif callable(method) or (method in _hessp_methods):
+                problem['hessp'] = hessian_vector_product(fun_opt)
             else:
-                def callback_scipy(x):
-                    x_s = x/scale
-                    x_wec, x_opt = self.decompose_state(x_s)
-                    return callback(self, x_wec, x_opt, wave)
-
-            # optimization problem
-            optim_options['disp'] = optim_options.get('disp', True)
-            problem = {'fun': obj_fun_scaled,
-                        'x0': x0,
-                        'method': 'SLSQP',
-                        'constraints': constraints,
-                        'options': optim_options,
-                        'bounds': bounds,
-                        'callback': callback_scipy,
-                        }
-            if use_grad:
-                problem['jac'] = grad(obj_fun_scaled)
-
-            # minimize
-            optim_res = minimize(**problem)
-
-            msg = f'{optim_res.message}    (Exit mode {optim_res.status})'
-            if optim_res.status == 0:
-                _log.info(msg)
-            elif optim_res.status == 9:
-                _log.warning(msg)
-            else:
-                raise Exception(msg)
+                problem['hess'] = hessian(fun_opt)
+            if method == 'trust-constr':
+                problem['constraints'] = [
+                    _constraint_with_hess(icons, z0.size)
+                    for icons in constraints]
+        elif use_hess:
+            _log.info(f"Method '{method}' does not use the Hessian.")
+
+        # minimize, the excitation is constant for this realization
+        optim_res = None
+        with self._cached_excitation():
+            if quadratic_objective and self.constraints:
+                _log.info("The closed-form solution does not support "
+                          + "constraints, using the optimizer instead.")
+            elif quadratic_objective:
+                optim_res = _solve_quadratic(
+                    obj_fun_scaled, scaled_resid_fun, resid_jac, x0,
+                    bounds)
+            if optim_res is None:
+                optim_res = _minimize(problem, budget)
+                optim_res = self._tighten_aggregated(
+                    optim_res, problem, to_full, scale, wave, budget)
+                if budget is not None:
+                    optim_res.maxcv = budget.violation(optim_res.x)
+                if 'grad' in optim_res:
+                    # e.g. 'trust-constr', 'jac' are the constraints'
+                    optim_res.jac = optim_res.grad
+                if resid_wec_inv is not None:
+                    optim_res.x = to_full(optim_res.x)
+                    optim_res.jac = value_and_grad(obj_fun_scaled)(
+                        optim_res.x)[1]
+                    x_no_wec = np.concatenate(
+                        [np.zeros(nstate_wec), optim_res.x[nstate_wec:]])
+                    resid = np.max(np.abs(scaled_resid_fun(optim_res.x)))
+                    resid_0 = np.max(np.abs(scaled_resid_fun(x_no_wec)))
+                    if resid > 1e-6*resid_0:
+                        _log.warning(
+                            "The dynamics are not satisfied by the " +
+                            f"reduced-space solution (residual {resid:.2e})" +
+                            ". The residual must be affine in 'x_wec', " +
+                            "with a Jacobian independent of 'x_opt'.")
+
+        msg = f'{optim_res.message}    (Exit mode {optim_res.status})'
+        if optim_res.success:
+            _log.info(msg)
+        elif optim_res.get('budget_exhausted', False):
+            _log.warning(msg + f'    (Constraint violation {optim_res.maxcv:.2e})')
+        elif _iteration_limit_reached(optim_res, optim_options):
+            _log.warning(msg)
+        else:
+            raise Exception(msg)
 
-            # unscale
-            optim_res.x = optim_res.x / scale
-            optim_res.fun = optim_res.fun / scale_obj
-            optim_res.jac = optim_res.jac / scale_obj * scale
+        # unscale
+        optim_res.x = optim_res.x / scale
+        optim_res.fun = optim_res.fun / scale_obj
+        optim_res.jac = optim_res.jac / scale_obj * scale
 
-            results.append(optim_res)
+        # frequency grid, for warm starts
+        optim_res.f1 = self.f1
+        optim_res.nfreq = self.nfreq
 
-        return results
+        return optim_res
 
     def post_process(self,
         wec: TWEC,
         res: Union[OptimizeResult, Iterable],
         waves: Dataset,
         nsubsteps: Optional[int] = 1,
-    ) -> tuple[list[Dataset], list[Dataset]]:
+        batch: Optional[bool] = False,
+        variables: Optional[Iterable[str]] = None,
+    ) -> Union[tuple[list[Dataset], list[Dataset]], tuple[Dataset, Dataset]]:
         """Post-process the results from :py:meth:`wecopttool.WEC.solve`.
 
         Parameters
@@ -867,6 +2117,25 @@ class WEC:
             Number of steps between the default (implied) time steps.
             A value of :python:`1` corresponds to the default step
             length.
+        batch
+            If :python:`True`, post-process all realizations together
+            and return a single :py:class:`xarray.Dataset` for each
+            domain, with a :python:`realization` dimension, instead of
+            lists.
+            The states of all realizations are evaluated in a single
+            pass and the datasets are created only once.
+        variables
+            Names of the variables to compute, any of :python:`'pos'`,
+            :python:`'vel'`, :python:`'acc'`, :python:`'force'` and
+            :python:`'wave_elev'`.
+            Other variables are not computed, e.g. the forces are not
+            evaluated unless :python:`'force'` is included.
+            If :python:`None` (default) all variables are computed.
+
+        Raises
+        ------
+        ValueError
+            If :python:`variables` contains an unknown variable name.
 
         Returns
         -------
@@ -890,12 +2159,26 @@ class WEC:
 
         Note that :py:meth:`wecopttool.WEC.solve` method produces a list of
         results objects (one for each phase realization).
+        To get a single dataset for all realizations
+
+        >>> res_wec_fd, res_wec_td = wec.post_process(wec, res_opt, wave,
+                                                      batch=True)
         """
         assert self == wec , ("The same wec object should be used to call " +
                                 "post-process and be passed as an input.")
+        all_variables = ['pos', 'vel', 'acc', 'force', 'wave_elev']
+        if variables is None:
+            variables = all_variables
+        elif isinstance(variables, str):
+            variables = [variables]
+        unknown = set(variables) - set(all_variables)
+        if unknown:
+            raise ValueError(f"Unknown variables {sorted(unknown)}, must " +
+                             f"be in {all_variables}.")
 
         def _postproc(res, waves, nsubsteps):
             create_time = f"{datetime.utcnow()}"
+            nreal = len(res)
 
             omega_vals = np.concatenate([[0], waves.omega.values])
             freq_vals = np.concatenate([[0], waves.freq.values])
@@ -910,48 +2193,60 @@ class WEC:
             dof_attr = {'long_name': 'Degree of freedom'}
             force_attr = {'long_name': 'Force or moment', 'units': 'N or Nm'}
             wave_elev_attr = {'long_name': 'Wave elevation', 'units': 'm'}
-            x_wec, x_opt = self.decompose_state(res.x)
+            states = [self.decompose_state(ires.x) for ires in res]
             omega_coord = ("omega", omega_vals, omega_attr)
             freq_coord = ("omega", freq_vals, freq_attr)
             period_coord = ("omega", period_vals, period_attr)
             dof_coord = ("influenced_dof", self.dof_names, dof_attr)
 
+            def realizations_fd(fd):
+                # columns of all realizations to (realization, omega, dof)
+                fd = np.reshape(fd, (fd.shape[0], nreal, -1))
+                return np.transpose(fd, (1, 0, 2))
+
             # frequency domain
-            force_da_list = []
-            for name, force in self.forces.items():
-                force_td_tmp = force(self, x_wec, x_opt, waves)
-                force_fd = self.td_to_fd(force_td_tmp)
-                force_da = DataArray(data=force_fd,
-                                    dims=["omega", "influenced_dof"],
-                                    coords={
-                                        'omega': omega_coord,
-                                        'freq': freq_coord,
-                                        'period': period_coord,
-                                        'influenced_dof': dof_coord},
-                                    attrs=force_attr
-                                    ).expand_dims({'type': [name]})
-                force_da_list.append(force_da)
-
-            fd_forces = xr.concat(force_da_list, dim='type')
-            fd_forces.type.attrs['long_name'] = 'Type'
-            fd_forces.name = 'force'
-            fd_forces.attrs['long_name'] = 'Force'
-
-            pos = self.vec_to_dofmat(x_wec)
-            pos_fd = real_to_complex(pos)
-
-            vel = self.derivative_mat @ pos
-            vel_fd = real_to_complex(vel)
-
-            acc = self.derivative2_mat @ pos
-            acc_fd = real_to_complex(acc)
+            results_list = []
+            if 'force' in variables:
+                force_fd = []
+                for force in self.forces.values():
+                    force_td = np.concatenate(
+                        [force(self, x_wec, x_opt, waves.isel(realization=i))
+                         for i, (x_wec, x_opt) in enumerate(states)], axis=1)
+                    force_fd.append(realizations_fd(self.td_to_fd(force_td)))
+                fd_forces = DataArray(data=np.stack(force_fd, axis=-1),
+                                      dims=["realization", "omega",
+                                            "influenced_dof", "type"],
+                                      coords={
+                                          'realization': waves.realization,
+                                          'omega': omega_coord,
+                                          'freq': freq_coord,
+                                          'period': period_coord,
+                                          'influenced_dof': dof_coord,
+                                          'type': list(self.forces.keys())},
+                                      attrs=force_attr)
+                fd_forces.type.attrs['long_name'] = 'Type'
+                fd_forces.name = 'force'
+                fd_forces.attrs['long_name'] = 'Force'
+                results_list.append(fd_forces)
+
+            # states of all realizations as columns
+            pos = np.concatenate(
+                [self.vec_to_dofmat(x_wec) for x_wec, _ in states], axis=1)
+            state_mats = {'pos': (None, pos_attr),
+                          'vel': (self.derivative_mat, vel_attr),
+                          'acc': (self.derivative2_mat, acc_attr)}
+            state_dims = ['realization', 'omega', 'influenced_dof']
+            state_vars = {}
+            for name, (mat, attr) in state_mats.items():
+                if name in variables:
+                    state = pos if (mat is None) else mat @ pos
+                    state_fd = realizations_fd(real_to_complex(state))
+                    state_vars[name] = (state_dims, state_fd, attr)
 
             fd_state = Dataset(
-                data_vars={
-                    'pos': (['omega', 'influenced_dof'], pos_fd, pos_attr),
-                    'vel': (['omega', 'influenced_dof'], vel_fd, vel_attr),
-                    'acc': (['omega', 'influenced_dof'], acc_fd, acc_attr)},
+                data_vars=state_vars,
                 coords={
+                    'realization': waves.realization,
                     'omega': omega_coord,
                     'freq': freq_coord,
                     'period': period_coord,
@@ -959,9 +2254,12 @@ class WEC:
                 attrs={"time_created_utc": create_time}
             )
 
-            results_fd = xr.merge([fd_state, fd_forces, waves])
-            results_fd = results_fd.transpose('omega', 'influenced_dof', 'type',
-                                            'wave_direction')
+            if 'wave_elev' in variables:
+                results_list.append(waves)
+            results_fd = xr.merge([fd_state] + results_list)
+            results_fd = results_fd.transpose(
+                'realization', 'omega', 'influenced_dof', 'type',
+                'wave_direction', missing_dims='ignore')
             results_fd = results_fd.fillna(0)
 
             # time domain
@@ -970,21 +2268,25 @@ class WEC:
                 data=t_dat, name='time', dims='time', coords=[t_dat])
             results_td = results_fd.map(lambda x: time_results(x, time))
 
-            results_td['pos'].attrs = pos_attr
-            results_td['vel'].attrs = vel_attr
-            results_td['acc'].attrs = acc_attr
-            results_td['wave_elev'].attrs = wave_elev_attr
-            results_td['force'].attrs = force_attr
+            td_attrs = {'pos': pos_attr, 'vel': vel_attr, 'acc': acc_attr,
+                        'wave_elev': wave_elev_attr, 'force': force_attr}
+            for name in variables:
+                results_td[name].attrs = td_attrs[name]
             results_td['time'].attrs = time_attr
             results_td.attrs['time_created_utc'] = create_time
             return results_fd, results_td
 
+        if batch:
+            realizations = list(range(len(res)))
+            return _postproc(
+                res, waves.sel(realization=realizations), nsubsteps)
         results_fd = []
         results_td = []
         for idx, ires in enumerate(res):
-            ifd, itd = _postproc(ires, waves.sel(realization=idx), nsubsteps)
-            results_fd.append(ifd)
-            results_td.append(itd)
+            ifd, itd = _postproc([ires], waves.sel(realization=[idx]),
+                                 nsubsteps)
+            results_fd.append(ifd.isel(realization=0))
+            results_td.append(itd.isel(realization=0))
         return results_fd, results_td
 
     # properties
@@ -997,6 +2299,17 @@ class WEC:
     def forces(self, val):
         self._forces = dict(val)
 
+    @property
+    def fuse_linear_forces(self) -> bool:
+        """Whether the inertia and linear forces are combined into a
+        single operator when evaluating the residual.
+        """
+        return self._fuse_linear_forces
+
+    @fuse_linear_forces.setter
+    def fuse_linear_forces(self, val):
+        self._fuse_linear_forces = bool(val)
+
     @property
     def constraints(self) -> list[dict]:
         """List of constraints."""
@@ -1303,6 +2616,826 @@ class WEC:
         return td_to_fd(td, fft, True)
 
 
+class MIMOTransferMatrix:
+    """Compact representation of the real block matrix of a MIMO
+    transfer function.
+
+    The real matrix produced by :py:func:`wecopttool.mimo_transfer_mat`
+    relates the state representation of two variables,
+    :python:`x=[X0, Re(X1), Im(X1), ..., Re(Xn)]` for each degree of
+    freedom.
+    Each pair of degrees of freedom only couples components of the same
+    frequency, so the matrix is block-diagonal in frequency with
+    :python:`2x2` blocks.
+    This class only stores the complex transfer matrix per frequency,
+    size :python:`(nfreq+1, nout, nin)`, and applies it without
+    assembling the dense :python:`(nout*2*nfreq, nin*2*nfreq)` matrix.
+
+    Instances support the matrix product :python:`mat @ x` with a state
+    vector, or a 2D array with one state vector per column, including
+    when :python:`x` is traced by
+    `autograd <https://github.com/HIPS/autograd>`_.
+    The dense matrix can be obtained with
+    :py:meth:`wecopttool.MIMOTransferMatrix.to_dense` or
+    :python:`np.asarray(mat)`.
+    """
+
+    def __init__(
+        self,
+        transfer_mat: ArrayLike,
+        zero_freq: Optional[bool] = True,
+    ) -> None:
+        """Create the compact representation of a MIMO transfer
+        matrix.
+
+        As in :py:func:`wecopttool.mimo_transfer_mat`, only the real
+        part of the zero and highest frequency components is used.
+
+        Parameters
+        ----------
+        transfer_mat
+            Complex transfer matrix of size
+            :python:`(nfreq+1, nout, nin)`, or
+            :python:`(nfreq, nout, nin)` if :python:`zero_freq` is
+            :python:`False`.
+        zero_freq
+            Whether the first frequency should be zero.
+            If :python:`False` the zero-frequency components are zero.
+        """
+        transfer_mat = np.array(transfer_mat, dtype=complex)
+        if not zero_freq:
+            zero = np.zeros((1, *transfer_mat.shape[1:]), dtype=complex)
+            transfer_mat = np.concatenate([zero, transfer_mat])
+        transfer_mat[0] = np.real(transfer_mat[0])
+        transfer_mat[-1] = np.real(transfer_mat[-1])
+        self._transfer_mat = transfer_mat
+        # real 2x2 block [[re, -im], [im, re]] of each frequency and pair
+        # of degrees of freedom, ordered as (cosine, sine) per DOF
+        re = np.real(transfer_mat)
+        im = np.imag(transfer_mat)
+        blocks = np.stack([
+            np.stack([re, -im], axis=-1),
+            np.stack([im, re], axis=-1),
+        ], axis=2)
+        nmat, nout, _, nin, _ = blocks.shape
+        self._blocks = np.reshape(blocks, (nmat, 2*nout, 2*nin))
+
+    def __matmul__(self, x: ArrayLike) -> ndarray:
+        nfreq, nin, nout = self.nfreq, self.nin, self.nout
+        ndim = np.ndim(x)
+        x = np.reshape(x, (nin, 2*nfreq, -1))
+        nvec = x.shape[-1]
+        # insert zero sine components of the zero and highest frequency
+        zero = np.zeros((nin, 1, nvec))
+        x = np.concatenate([x[:, :1], zero, x[:, 1:], zero], axis=1)
+        x = np.reshape(x, (nin, nfreq+1, 2, nvec))
+        x = np.reshape(np.transpose(x, (1, 0, 2, 3)), (nfreq+1, 2*nin, nvec))
+        y = np.matmul(self._blocks, x)
+        y = np.reshape(y, (nfreq+1, nout, 2, nvec))
+        y = np.reshape(np.transpose(y, (1, 0, 2, 3)), (nout, 2*nfreq+2, nvec))
+        y = np.concatenate([y[:, :1], y[:, 2:-1]], axis=1)
+        y = np.reshape(y, (nout*2*nfreq, nvec))
+        return y[:, 0] if ndim == 1 else y
+
+    def __array__(self, dtype=None, copy=None) -> ndarray:
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype)
+
+    def to_dense(self) -> ndarray:
+        """Assemble the dense real matrix, see
+        :py:func:`wecopttool.mimo_transfer_mat`.
+        """
+        return self @ np.eye(self.shape[1])
+
+    def inv(self) -> MIMOTransferMatrix:
+        """Inverse, computed independently for each frequency."""
+        return MIMOTransferMatrix(np.linalg.inv(self._transfer_mat))
+
+    @property
+    def T(self) -> MIMOTransferMatrix:
+        """Transpose."""
+        return MIMOTransferMatrix(
+            np.conj(np.transpose(self._transfer_mat, (0, 2, 1))))
+
+    @property
+    def transfer_mat(self) -> ndarray:
+        """Complex transfer matrix, size :python:`(nfreq+1, nout, nin)`.
+        """
+        return self._transfer_mat
+
+    @property
+    def nfreq(self) -> int:
+        """Number of frequencies, not including the zero-frequency."""
+        return self._transfer_mat.shape[0] - 1
+
+    @property
+    def nout(self) -> int:
+        """Number of output degrees of freedom."""
+        return self._transfer_mat.shape[1]
+
+    @property
+    def nin(self) -> int:
+        """Number of input degrees of freedom."""
+        return self._transfer_mat.shape[2]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        """Shape of the equivalent dense real matrix."""
+        ncomp = ncomponents(self.nfreq)
+        return (self.nout*ncomp, self.nin*ncomp)
+
+
+class LinearForce:
+    """A force that is linear in the WEC dynamics state, defined by its
+    complex position transfer matrix.
+
+    The real MIMO transfer matrix is assembled once, when the force is
+    created, so that evaluating the force only applies it to the state.
+    It is stored as a :py:class:`wecopttool.MIMOTransferMatrix`, which
+    keeps only the per-frequency blocks of the matrix.
+    Instances are callable with the :python:`StateFunction` signature
+    :python:`force(wec, x_wec, x_opt, waves)` and can be used directly
+    as entries of the :py:attr:`wecopttool.WEC.forces` dictionary.
+
+    Linear forces can be added, subtracted, and negated, which combines
+    their transfer matrices into a single linear force.
+
+    Use :py:func:`wecopttool.force_from_rao_transfer_function` or
+    :py:func:`wecopttool.force_from_impedance` to create a
+    :py:class:`wecopttool.LinearForce`.
+    """
+
+    def __init__(
+        self,
+        rao_transfer_mat: DataArray,
+        zero_freq: Optional[bool] = True,
+    ) -> None:
+        """Create a linear force from its position transfer matrix.
+
+        Parameters
+        ----------
+        rao_transfer_mat
+            Complex position transfer matrix of size
+            :python:`(nfreq, ndof, ndof)`, or
+            :python:`(nfreq+1, ndof, ndof)` if :python:`zero_freq` is
+            :python:`True`.
+        zero_freq
+            Whether the first frequency should be zero. Default is
+            :python:`True`.
+        """
+        rao_transfer_mat = np.asarray(rao_transfer_mat) + 0j
+        if not zero_freq:
+            zero = np.zeros((1, *rao_transfer_mat.shape[1:]), dtype=complex)
+            rao_transfer_mat = np.concatenate([zero, rao_transfer_mat])
+        self._rao_transfer_mat = rao_transfer_mat
+        self._zero_freq = zero_freq
+        self._transfer_mat = MIMOTransferMatrix(rao_transfer_mat)
+
+    def __call__(self,
+        wec: TWEC,
+        x_wec: ndarray,
+        x_opt: ndarray,
+        waves: Dataset,
+    ) -> ndarray:
+        """Evaluate the time-domain force.
+
+        Parameters
+        ----------
+        wec
+            :py:class:`wecopttool.WEC` object.
+        x_wec
+            WEC dynamic state.
+        x_opt
+            Optimization (control) state. Not used.
+        waves
+            :py:class:`xarray.Dataset` with the structure and elements
+            shown by :py:mod:`wecopttool.waves`. Not used.
+        """
+        force_fd = wec.vec_to_dofmat(self._transfer_mat @ x_wec)
+        return state_to_td(force_fd)
+
+    def __add__(self, other: LinearForce) -> LinearForce:
+        if not isinstance(other, LinearForce):
+            return NotImplemented
+        return LinearForce(
+            self.rao_transfer_mat + other.rao_transfer_mat, True)
+
+    def __neg__(self) -> LinearForce:
+        return LinearForce(-1*self.rao_transfer_mat, True)
+
+    def __sub__(self, other: LinearForce) -> LinearForce:
+        if not isinstance(other, LinearForce):
+            return NotImplemented
+        return self + (-other)
+
+    def truncate(self, nfreq: int) -> LinearForce:
+        """Linear force restricted to the first :python:`nfreq`
+        frequencies.
+
+        Parameters
+        ----------
+        nfreq
+            Number of frequencies to keep, not including the zero
+            frequency.
+        """
+        rao_transfer_mat = self.rao_transfer_mat[:nfreq+1]
+        if not self.zero_freq:
+            rao_transfer_mat = rao_transfer_mat[1:]
+        return LinearForce(rao_transfer_mat, self.zero_freq)
+
+    @property
+    def rao_transfer_mat(self) -> ndarray:
+        """Complex position transfer matrix of size
+        :python:`(nfreq+1, ndof, ndof)`, including the zero frequency.
+        """
+        return self._rao_transfer_mat
+
+    @property
+    def transfer_mat(self) -> MIMOTransferMatrix:
+        """Real MIMO transfer matrix, in the compact form of
+        :py:class:`wecopttool.MIMOTransferMatrix`.
+        """
+        return self._transfer_mat
+
+    @property
+    def zero_freq(self) -> bool:
+        """Whether the original transfer matrix included the zero
+        frequency.
+        """
+        return self._zero_freq
+
+
+class ExcitationForce:
+    """A force due to waves, defined by its complex excitation
+    coefficients.
+
+    Instances are callable with the :python:`StateFunction` signature
+    :python:`force(wec, x_wec, x_opt, waves)` and can be used directly
+    as entries of the :py:attr:`wecopttool.WEC.forces` dictionary.
+
+    Excitation forces with the same frequencies and wave directions
+    can be added, which sums their excitation coefficients into a
+    single excitation force.
+    Within :py:meth:`wecopttool.ExcitationForce.cached`, e.g. while
+    :py:meth:`wecopttool.WEC.solve` solves a wave realization, the
+    time-domain force is computed once and reused.
+
+    Use :py:func:`wecopttool.force_from_waves` to create a
+    :py:class:`wecopttool.ExcitationForce`.
+    """
+
+    def __init__(self, force_coeff: DataArray) -> None:
+        """Create an excitation force from its coefficients.
+
+        Parameters
+        ----------
+        force_coeff
+            Complex excitation coefficients indexed by frequency and
+            direction angle.
+        """
+        self._force_coeff = force_coeff
+        self._cache_depth = 0
+        self._cache = None
+
+    def __call__(self,
+        wec: TWEC,
+        x_wec: ndarray,
+        x_opt: ndarray,
+        waves: Dataset,
+    ) -> ndarray:
+        """Evaluate the time-domain force.
+
+        Parameters
+        ----------
+        wec
+            :py:class:`wecopttool.WEC` object.
+        x_wec
+            WEC dynamic state. Not used.
+        x_opt
+            Optimization (control) state. Not used.
+        waves
+            :py:class:`xarray.Dataset` with the structure and elements
+            shown by :py:mod:`wecopttool.waves`.
+        """
+        if (self._cache is not None) and (self._cache[0] is waves):
+            return self._cache[1]
+        force_fd = complex_to_real(
+            wave_excitation(self._force_coeff, waves), False)
+        force_td = state_to_td(force_fd, zero_freq=False)
+        if self._cache_depth > 0:
+            self._cache = (waves, force_td)
+        return force_td
+
+    @contextmanager
+    def cached(self) -> Iterator[ExcitationForce]:
+        """Context in which the time-domain force is only computed once
+        for a given waves object.
+
+        The force does not depend on the WEC or optimization states,
+        so repeated evaluations for the same waves, e.g. while solving
+        a single wave realization, return the stored force.
+        The waves object is identified by identity and should not be
+        modified inside the context.
+        The stored force is discarded when leaving the context.
+        """
+        self._cache_depth += 1
+        try:
+            yield self
+        finally:
+            self._cache_depth -= 1
+            if self._cache_depth == 0:
+                self._cache = None
+
+    def __add__(self, other: ExcitationForce) -> ExcitationForce:
+        if not isinstance(other, ExcitationForce):
+            return NotImplemented
+        coeff_a, coeff_b = xr.align(
+            self.force_coeff, other.force_coeff, join='exact')
+        return ExcitationForce(coeff_a + coeff_b)
+
+    def truncate(self, nfreq: int) -> ExcitationForce:
+        """Excitation force restricted to the first :python:`nfreq`
+        frequencies.
+
+        Parameters
+        ----------
+        nfreq
+            Number of frequencies to keep.
+        """
+        return ExcitationForce(self.force_coeff.isel(omega=slice(0, nfreq)))
+
+    @property
+    def force_coeff(self) -> DataArray:
+        """Complex excitation coefficients."""
+        return self._force_coeff
+
+
+class _AggregatedConstraint:
+    """Inequality constraint function aggregated into a few smooth
+    constraints, see :py:func:`wecopttool.aggregate_constraint`.
+
+    The aggregation parameter can be increased between solves.
+    """
+
+    def __init__(
+        self,
+        fun: TStateFunction,
+        scale: float,
+        method: str,
+        parameter: float,
+        ngroups: int,
+        rtol: float,
+        max_updates: int,
+    ) -> None:
+        self.fun = fun
+        self.scale = scale
+        self.method = method
+        self.parameter = parameter
+        self.ngroups = ngroups
+        self.rtol = rtol
+        self.max_updates = max_updates
+
+    def __call__(self,
+        wec: TWEC,
+        x_wec: ndarray,
+        x_opt: ndarray,
+        waves: Dataset,
+    ) -> ndarray:
+        """Evaluate the aggregated constraints."""
+        values = self.exact(wec, x_wec, x_opt, waves) / self.scale
+        edges = np.linspace(0, values.size, self.ngroups+1).astype(int)
+        aggregated = [self._aggregate(values[i:j])
+                      for i, j in zip(edges[:-1], edges[1:]) if j > i]
+        return self.scale * np.stack(aggregated)
+
+    def exact(self,
+        wec: TWEC,
+        x_wec: ndarray,
+        x_opt: ndarray,
+        waves: Dataset,
+    ) -> ndarray:
+        """Evaluate the original constraint."""
+        return np.reshape(self.fun(wec, x_wec, x_opt, waves), -1)
+
+    def _aggregate(self, values: ndarray) -> float:
+        """Smooth lower bound of the minimum of normalized values."""
+        rho = self.parameter
+        if self.method == 'ks':
+            vmax = np.max(-1*values)
+            return -1*(vmax + np.log(np.sum(np.exp(rho*(-1*values - vmax))))/rho)
+        usage = np.maximum(1 - values, 0.0)
+        umax = np.maximum(np.max(usage), np.finfo(float).tiny)
+        return 1 - umax*np.sum((usage/umax)**rho)**(1/rho)
+
+
+def _affine_constraint(
+    constraint: dict,
+    x0: ndarray,
+    method: Union[str, Callable],
+) -> Union[dict, LinearConstraint]:
+    """Constraint dictionary of an affine constraint with its constant
+    Jacobian, evaluated once at :python:`x0`.
+
+    For the :python:`'trust-constr'` method a
+    :py:class:`scipy.optimize.LinearConstraint` is returned instead, so
+    that it does not contribute to the Hessian of the Lagrangian.
+    The Jacobian of time-domain constraints is dense, and it is kept as
+    a dense matrix.
+    """
+    fun = constraint['fun']
+    jac = np.atleast_2d(jacobian(fun)(x0))
+    if method == 'trust-constr':
+        fun_0 = np.atleast_1d(fun(x0)) - np.dot(jac, x0)
+        ub = -fun_0 if (constraint['type'] == 'eq') else np.inf
+        return LinearConstraint(jac, -fun_0, ub)
+    return {'type': constraint['type'], 'fun': fun, 'jac': lambda x: jac}
+
+
+def _constraint_with_hess(
+    constraint: Union[dict, LinearConstraint],
+    nstate: int,
+) -> Union[NonlinearConstraint, LinearConstraint]:
+    """Convert a constraint dictionary to a
+    :py:class:`scipy.optimize.NonlinearConstraint` with the exact
+    Hessian of its contribution to the Lagrangian, :math:`v^Tc(x)`, as
+    a linear operator of Hessian-vector products.
+
+    Linear constraints are returned unchanged.
+    """
+    if isinstance(constraint, LinearConstraint):
+        return constraint
+    fun = constraint['fun']
+    jac = constraint.get('jac', jacobian(fun))
+    ub = 0.0 if (constraint['type'] == 'eq') else np.inf
+
+    def hess(x, v):
+        hvp = hessian_vector_product(lambda x: np.dot(v, fun(x)))
+        return LinearOperator((nstate, nstate), matvec=lambda p: hvp(x, np.ravel(p)))
+
+    return NonlinearConstraint(fun, 0.0, ub, jac=jac, hess=hess)
+
+
+class _MemoizedObjective:
+    """Objective function that evaluates its value and gradient in a
+    single pass and stores them for the last decision variable.
+
+    The optimizer's :python:`fun` and :python:`jac`, and the logging
+    callback, can then be served from the same evaluation.
+    """
+
+    def __init__(self, fun: Callable[[ndarray], float], use_grad: bool):
+        self._fun = value_and_grad(fun) if use_grad else fun
+        self._use_grad = use_grad
+        self._x = None
+        self._value = None
+        self._grad = None
+
+    def _evaluate(self, x: ndarray) -> None:
+        if (self._x is not None) and np.array_equal(x, self._x):
+            return
+        if self._use_grad:
+            self._value, self._grad = self._fun(x)
+        else:
+            self._value = self._fun(x)
+        self._x = np.array(x, copy=True)
+
+    def fun(self, x: ndarray) -> float:
+        """Objective function value."""
+        self._evaluate(x)
+        return self._value
+
+    def jac(self, x: ndarray) -> ndarray:
+        """Objective function gradient."""
+        self._evaluate(x)
+        return self._grad
+
+
+class _Checkpoint:
+    """Progress of :py:meth:`wecopttool.WEC.solve` saved to a file.
+
+    The file is replaced atomically, so that it is always a complete
+    checkpoint.
+    """
+
+    def __init__(
+        self,
+        fpath: Union[str, Path],
+        interval: int,
+        f1: float,
+        nfreq: int,
+        scale: ndarray,
+        scale_obj: float,
+        state: Optional[dict] = None,
+    ) -> None:
+        self.fpath = Path(fpath)
+        self.interval = interval
+        self.state = {'f1': f1, 'nfreq': nfreq, 'scale': scale,
+                      'scale_obj': scale_obj, 'results': {},
+                      'realization': None, 'x': None}
+        if state is not None:
+            # resumed solve, keep the progress until it is updated
+            for key in ['results', 'realization', 'x']:
+                self.state[key] = state[key]
+            self.state['results'] = dict(state['results'])
+        self._nit = 0
+
+    @staticmethod
+    def load(fpath: Union[str, Path]) -> dict:
+        """Read a checkpoint file."""
+        with open(fpath, 'rb') as f:
+            return pickle.load(f)
+
+    def save(self) -> None:
+        """Write the checkpoint file."""
+        fpath_tmp = self.fpath.with_name(self.fpath.name + '.tmp')
+        with open(fpath_tmp, 'wb') as f:
+            pickle.dump(self.state, f)
+        os.replace(fpath_tmp, self.fpath)
+
+    def iterate(self, realization: Any, x: ndarray) -> None:
+        """Save the scaled iterate every :python:`interval`
+        iterations.
+        """
+        if self.state['realization'] != realization:
+            self.state['realization'] = realization
+            self._nit = 0
+        self._nit += 1
+        if self._nit % self.interval == 0:
+            self.state['x'] = np.array(x, copy=True)
+            self.save()
+
+    def finished(self, realization: Any, result: OptimizeResult) -> None:
+        """Save the results of a finished realization."""
+        self.state['results'][realization] = result
+        self.state['realization'] = None
+        self.state['x'] = None
+        self.save()
+
+
+class _BudgetExhausted(Exception):
+    """The time or evaluation budget of a solve is exhausted."""
+
+
+class _SolveBudget:
+    """Wall-clock time and objective evaluation budget of a solve,
+    which keeps track of the best iterate.
+
+    The best iterate is the feasible iterate, with a maximum constraint
+    violation of at most :python:`feasibility_tol`, with the lowest
+    objective function, or the iterate with the lowest violation if
+    none is feasible.
+    """
+
+    def __init__(
+        self,
+        time_limit: Optional[float],
+        max_nfev: Optional[int],
+        feasibility_tol: float,
+        violation: Callable[[ndarray], float],
+        jac: Optional[Callable[[ndarray], ndarray]],
+    ) -> None:
+        self.time_limit = time_limit
+        self.max_nfev = max_nfev
+        self.feasibility_tol = feasibility_tol
+        self.violation = violation
+        self._jac = jac
+        self._start = perf_counter()
+        self.nfev = 0
+        self.nit = 0
+        self._best = None
+
+    def check(self) -> None:
+        """Raise :python:`_BudgetExhausted` if the budget is
+        exhausted.
+        """
+        if (self.time_limit is not None) and (
+                perf_counter() - self._start > self.time_limit):
+            raise _BudgetExhausted("Time limit reached.")
+        if (self.max_nfev is not None) and (self.nfev >= self.max_nfev):
+            raise _BudgetExhausted(
+                "Maximum number of function evaluations reached.")
+
+    def counted(self, fun: Callable[[ndarray], float]
+    ) -> Callable[[ndarray], float]:
+        """Objective function that checks the budget before each
+        evaluation.
+        """
+        def budget_fun(x):
+            self.check()
+            self.nfev += 1
+            return fun(x)
+        return budget_fun
+
+    def record(self, x: ndarray, value: float) -> None:
+        """Update the best iterate with the iterate :python:`x`."""
+        if self._best is not None:
+            self.nit += 1
+        maxcv = self.violation(x)
+        infeasible = maxcv > self.feasibility_tol
+        key = (infeasible, maxcv if infeasible else value)
+        if (self._best is None) or (key < self._best[0]):
+            self._best = (key, np.array(x, copy=True), value, maxcv)
+
+    def result(self, message: str) -> OptimizeResult:
+        """Optimization results for the best iterate."""
+        _, x, value, maxcv = self._best
+        jac = np.full(x.shape, np.nan) if self._jac is None else self._jac(x)
+        return OptimizeResult(
+            x=x, fun=value, jac=jac, nit=self.nit, nfev=self.nfev,
+            success=False, status=-1, maxcv=maxcv, budget_exhausted=True,
+            message=f"{message} Returning the best iterate.")
+
+
+def _minimize(
+    problem: Mapping[str, Any],
+    budget: Optional[_SolveBudget],
+) -> OptimizeResult:
+    """Call :py:func:`scipy.optimize.minimize`, returning the best
+    iterate if the budget is exhausted.
+    """
+    if budget is None:
+        return minimize(**problem)
+    try:
+        optim_res = minimize(**problem)
+    except _BudgetExhausted as exhausted:
+        return budget.result(str(exhausted))
+    optim_res.budget_exhausted = False
+    return optim_res
+
+
+def _iteration_limit_reached(
+    optim_res: OptimizeResult,
+    optim_options: Mapping[str, Any],
+) -> bool:
+    """Whether the optimizer stopped at its maximum number of
+    iterations or function evaluations, for any method.
+    """
+    maxiter = optim_options.get('maxiter')
+    nit = optim_res.get('nit')
+    if (maxiter is not None) and (nit is not None) and (nit >= maxiter):
+        return True
+    return _iteration_limit_message.search(str(optim_res.message)) is not None
+
+
+def _max_violation(
+    constraints: list[Union[dict, LinearConstraint]],
+    bounds: Optional[Bounds],
+    x: ndarray,
+) -> float:
+    """Maximum violation of the constraints and bounds at
+    :python:`x`.
+    """
+    violation = [0.0]
+    for icons in constraints:
+        if isinstance(icons, LinearConstraint):
+            values = icons.A @ x
+            violation += [np.max(icons.lb - values),
+                          np.max(values - icons.ub)]
+        else:
+            values = np.atleast_1d(icons['fun'](x))
+            if values.size == 0:
+                continue
+            if icons['type'] == 'eq':
+                violation.append(np.max(np.abs(values)))
+            else:
+                violation.append(np.max(-1*values))
+    if bounds is not None:
+        violation += [np.max(bounds.lb - x), np.max(x - bounds.ub)]
+    return float(max(violation))
+
+
+def _solve_quadratic(
+    fun: Callable[[ndarray], float],
+    resid_fun: Callable[[ndarray], ndarray],
+    resid_jac: ndarray,
+    x0: ndarray,
+    bounds: Optional[Bounds] = None,
+    maxiter: Optional[int] = 100,
+) -> Optional[OptimizeResult]:
+    """Solve a quadratic program with affine equality constraints
+    from its optimality (KKT) conditions.
+
+    Minimizes the quadratic :python:`fun(x)` subject to
+    :python:`resid_fun(x) = 0`, with :python:`resid_jac` the constant
+    Jacobian of :python:`resid_fun`.
+    The equality constraints are eliminated once, with a basis of the
+    null space of :python:`resid_jac`, and the reduced Hessian is
+    obtained from Hessian-vector products along that basis only.
+    Its eigendecomposition, also computed once, transforms the problem
+    to one with an identity Hessian.
+    Bounds are then handled with the dual active-set method of
+    Goldfarb and Idnani, starting from the unconstrained minimum and
+    adding the most violated bound one at a time.
+    Step lengths are chosen by a ratio test, dropping at most one
+    active bound per step, so that the active set does not cycle.
+    Directions that do not affect the objective take a minimum-norm
+    value.
+
+    Returns :python:`None` if the problem is unbounded or infeasible,
+    or if the active set does not converge in :python:`maxiter` steps.
+    """
+    nvar = len(x0)
+    resid_0 = resid_fun(x0) - resid_jac @ x0
+
+    # eliminate the equality constraints, x = x_part + null @ y
+    x_part = np.linalg.lstsq(resid_jac, -resid_0, rcond=None)[0]
+    resid_part = resid_jac @ x_part + resid_0
+    if np.max(np.abs(resid_part)) > 1e-6 * max(1.0, np.max(np.abs(resid_0))):
+        _log.warning("Dynamics have no solution, using the optimizer.")
+        return None
+    null = null_space(resid_jac)
+    hvp = hessian_vector_product(fun)
+    hess_null = np.column_stack(
+        [hvp(x_part, null[:, i]) for i in range(null.shape[1])])
+    hess_red = null.T @ hess_null
+    hess_red = (hess_red + hess_red.T) / 2
+    grad_red = null.T @ value_and_grad(fun)(x_part)[1]
+
+    # curvature, transform to an identity Hessian, y = trans @ v
+    curvature, modes = np.linalg.eigh(hess_red)
+    tol = 1e-10 * max(1.0, np.max(np.abs(curvature), initial=0.0),
+                      np.max(np.abs(grad_red), initial=0.0))
+    flat = curvature <= tol
+    if np.any(curvature < -tol) or np.any(
+            np.abs(modes[:, flat].T @ grad_red) > tol):
+        _log.warning("Quadratic program is unbounded, using the optimizer.")
+        return None
+    trans = modes[:, ~flat] / np.sqrt(curvature[~flat])
+    step = null @ trans
+    v = -trans.T @ grad_red
+
+    # bounds as constraints cons @ v >= rhs
+    if bounds is None:
+        lb = np.full(nvar, -np.inf)
+        ub = np.full(nvar, np.inf)
+    else:
+        lb = np.broadcast_to(bounds.lb, (nvar,))
+        ub = np.broadcast_to(bounds.ub, (nvar,))
+    has_lb = np.isfinite(lb)
+    has_ub = np.isfinite(ub)
+    cons = np.vstack([step[has_lb], -step[has_ub]])
+    rhs = np.concatenate([lb[has_lb] - x_part[has_lb],
+                          x_part[has_ub] - ub[has_ub]])
+    tol_cons = 1e-12 * max(1.0, np.max(np.abs(rhs), initial=0.0))
+
+    # dual active-set method
+    active = []
+    mult = np.zeros(0)
+    nit = 0
+    while True:
+        slack = cons @ v - rhs
+        if (len(slack) == 0) or (np.min(slack) >= -tol_cons):
+            break
+        add = int(np.argmin(slack))
+        mult_add = 0.0
+        while True:
+            nit += 1
+            if nit > maxiter:
+                _log.warning(
+                    "Active-set method did not converge, using the " +
+                    "optimizer.")
+                return None
+            normals = cons[active].T
+            if active:
+                mult_step = np.linalg.lstsq(
+                    normals, cons[add], rcond=None)[0]
+            else:
+                mult_step = np.zeros(0)
+            direction = cons[add] - normals @ mult_step
+
+            # partial step, limited by the multipliers of active bounds
+            dual_ratio = np.where(
+                mult_step > tol_cons, mult / np.where(
+                    mult_step > tol_cons, mult_step, 1.0), np.inf)
+            drop = int(np.argmin(dual_ratio)) if active else None
+            step_dual = dual_ratio[drop] if active else np.inf
+            # full step, to satisfy the added bound
+            curv = direction @ cons[add]
+            step_primal = np.inf
+            if curv > tol_cons * max(1.0, np.sum(cons[add]**2)):
+                step_primal = -(cons[add] @ v - rhs[add]) / curv
+            if np.isinf(step_dual) and np.isinf(step_primal):
+                _log.warning("Bounds are infeasible, using the optimizer.")
+                return None
+
+            length = min(step_dual, step_primal)
+            v = v + length*direction
+            mult = mult - length*mult_step
+            mult_add += length
+            if step_primal <= step_dual:
+                active.append(add)
+                mult = np.append(mult, mult_add)
+                break
+            del active[drop]
+            mult = np.delete(mult, drop)
+
+    x = x_part + step @ v
+    value, jac = value_and_grad(fun)(x)
+    return OptimizeResult(
+        x=x, fun=value, jac=jac, nit=max(nit, 1), nfev=1, njev=1, status=0,
+        success=True, message="Optimality conditions solved")
+
+
 def ncomponents(
     nfreq : int,
     zero_freq: Optional[bool] = True,
@@ -1536,6 +3669,10 @@ def mimo_transfer_mat(
         Complex transfer matrix.
     zero_freq
         Whether the first frequency should be zero.
+
+    See Also
+    --------
+    MIMOTransferMatrix
     """
     ndof = transfer_mat.shape[1]
     assert transfer_mat.shape[2] == ndof
@@ -1810,7 +3947,7 @@ def td_to_fd(
     td= atleast_2d(td)
     n = td.shape[0]
     if fft:
-        fd = np.fft.rfft(td, n=n, axis=0, norm='forward')
+        fd = np.fft.rfft(td, n=n, axis=0) / n
     else:
         fd = np.dot(dft(n, 'n')[:n//2+1, :], td)
     fd = np.concatenate((fd[:1, :], fd[1:-1, :]*2, fd[-1:, :]))
@@ -1819,6 +3956,102 @@ def td_to_fd(
     return fd
 
 
+def state_to_td(
+    state: ArrayLike,
+    nsubsteps: Optional[int] = 1,
+    zero_freq: Optional[bool] = True,
+) -> ndarray:
+    """Convert a real state representation to a time-series.
+
+    For a state :math:`x` consisting of the mean (DC) component
+    followed by the real and imaginary components of the Fourier
+    coefficients (excluding the imaginary component of the 2-point wave)
+    as :math:`x=[X0, Re(X1), Im(X1), ..., Re(Xn)]`, this is equivalent
+    to the product :python:`time_mat(f1, nfreq, nsubsteps) @ x`, but
+    without assembling the time matrix.
+    The input can also be a 2D array with one state per column, as
+    returned by :py:func:`wecopttool.vec_to_dofmat`.
+    The time-series is at times
+    :python:`wecopttool.time(f1, nfreq, nsubsteps)`.
+
+    Small problems use a cached time matrix.
+    For larger problems the time matrix is not assembled and the
+    inverse real FFT is used instead, with the :python:`nsubsteps`
+    oversampling obtained by zero-padding the higher frequencies.
+    This reduces the cost from :math:`O(N^2)` to :math:`O(N \\log N)`.
+
+    Can be differentiated with
+    `autograd <https://github.com/HIPS/autograd>`_.
+
+    If :python:`zero_freq = False` (not default), the mean (DC) component
+    :python:`X0` is excluded, and the vector length is reduced by 1.
+
+    Parameters
+    ----------
+    state
+        Real state representation, 1D vector or 2D array with one state
+        per column.
+    nsubsteps
+        Number of steps between the default (implied) time steps.
+        A value of :python:`1` corresponds to the default step length.
+    zero_freq
+        Whether the mean (DC) component is included.
+
+    See Also
+    --------
+    time_mat, fd_to_td
+    """
+    nrow = np.shape(state)[0]
+    ncomp = nrow + (not zero_freq)
+    nfreq = ncomp // 2
+    if nsubsteps*ncomp**2 <= _time_mat_max_size:
+        tmat = _unit_time_mat(nfreq, nsubsteps)
+        return np.dot(tmat if zero_freq else tmat[:, 1:], state)
+    ndim = np.ndim(state)
+    state = np.reshape(state, (nrow, -1))
+    ncol = state.shape[1]
+    # pad to [X0, 0, Re(X1), Im(X1), ..., Re(Xn), 0] and scale to the
+    # one-sided spectrum, the 2-point wave is only halved if oversampled
+    npts = nsubsteps*ncomp
+    zero = np.zeros((1, ncol))
+    if zero_freq:
+        state = np.concatenate([state[:1], zero, state[1:], zero])
+    else:
+        state = np.concatenate([zero, zero, state, zero])
+    fd = np.reshape(state*_one_sided_scale(nfreq, nsubsteps), (nfreq+1, 2, ncol))
+    fd = fd[:, 0] + 1j*fd[:, 1]
+    if nsubsteps > 1:
+        fd = np.concatenate([fd, np.zeros((npts//2 - nfreq, ncol))])
+    td = np.fft.irfft(fd, axis=0) * npts
+    return td[:, 0] if ndim == 1 else td
+
+
+@lru_cache(maxsize=16)
+def _unit_time_mat(nfreq: int, nsubsteps: int) -> ndarray:
+    """Time matrix for a fundamental frequency of 1 Hz. The time
+    matrix does not depend on the fundamental frequency.
+
+    The cached matrix is shared by all callers and is read-only.
+    """
+    tmat = time_mat(1.0, nfreq, nsubsteps)
+    tmat.setflags(write=False)
+    return tmat
+
+
+@lru_cache(maxsize=16)
+def _one_sided_scale(nfreq: int, nsubsteps: int) -> ndarray:
+    """Scaling of the padded state to one-sided Fourier coefficients.
+
+    The cached array is shared by all callers and is read-only.
+    """
+    scale = np.full((2*nfreq+2, 1), 0.5)
+    scale[:2] = 1.0
+    if nsubsteps == 1:
+        scale[-2:] = 1.0
+    scale.setflags(write=False)
+    return scale
+
+
 def read_netcdf(fpath: Union[str, Path]) -> Dataset:
     """Read a *NetCDF* file with possibly complex entries as a
     :py:class:`xarray.Dataset`.
@@ -1968,12 +4201,15 @@ def check_impedance(
 def force_from_rao_transfer_function(
     rao_transfer_mat: DataArray,
     zero_freq: Optional[bool] = True,
-) -> TStateFunction:
+) -> LinearForce:
     """Create a force function from its position transfer matrix.
 
     This is the position equivalent to the velocity-based
     :py:func:`wecopttool.force_from_impedance`.
 
+    The returned :py:class:`wecopttool.LinearForce` assembles the real
+    MIMO transfer matrix once, rather than on every evaluation.
+
     If :python:`zero_freq = False` (not default), the mean (DC) component
     of the transfer matrix (first row) is excluded.
 
@@ -1987,19 +4223,15 @@ def force_from_rao_transfer_function(
 
     See Also
     --------
-    force_from_impedance,
+    force_from_impedance, LinearForce
     """
-    def force(wec, x_wec, x_opt, waves):
-        transfer_mat = mimo_transfer_mat(rao_transfer_mat, zero_freq)
-        force_fd = wec.vec_to_dofmat(np.dot(transfer_mat, x_wec))
-        return np.dot(wec.time_mat, force_fd)
-    return force
+    return LinearForce(rao_transfer_mat, zero_freq)
 
 
 def force_from_impedance(
     omega: ArrayLike,
     impedance: DataArray,
-) -> TStateFunction:
+) -> LinearForce:
     """Create a force function from its impedance.
 
     Parameters
@@ -2017,7 +4249,7 @@ def force_from_impedance(
 
 
 def force_from_waves(force_coeff: DataArray,
-                     ) -> TStateFunction:
+                     ) -> ExcitationForce:
     """Create a force function from waves excitation coefficients.
 
     Parameters
@@ -2025,18 +4257,19 @@ def force_from_waves(force_coeff: DataArray,
     force_coeff
         Complex excitation coefficients indexed by frequency and
         direction angle.
+
+    See Also
+    --------
+    ExcitationForce
     """
-    def force(wec, x_wec, x_opt, waves):
-        force_fd = complex_to_real(wave_excitation(force_coeff, waves), False)
-        return np.dot(wec.time_mat[:, 1:], force_fd)
-    return force
+    return ExcitationForce(force_coeff)
 
 
 def inertia(
     f1: float,
     nfreq: int,
     inertia_matrix: ArrayLike,
-) -> TStateFunction:
+) -> LinearForce:
     """Create the inertia "force" from the inertia matrix.
 
     Parameters
@@ -2107,6 +4340,170 @@ def standard_forces(hydro_data: Dataset) -> TForceDict:
     return linear_force_functions
 
 
+def time_series_constraint(
+    fun: TStateFunction,
+    lower: Optional[FloatOrArray] = None,
+    upper: Optional[FloatOrArray] = None,
+    affine: Optional[bool] = True,
+) -> dict:
+    """Create an inequality constraint that bounds a time series,
+    :python:`lower <= fun(wec, x_wec, x_opt, waves) <= upper`.
+
+    This replaces constraints such as
+    :python:`f_max - np.abs(f)` with two smooth constraints,
+    :python:`f_max - f` and :python:`f - f_min`.
+    If :python:`fun` is affine in the decision variable, e.g. the
+    force, position, or velocity of a PTO with linear kinematics and an
+    unstructured controller, the constraint is affine and its Jacobian
+    is constant.
+    :py:meth:`wecopttool.WEC.solve` then computes it once per wave
+    realization instead of at every iteration, and the
+    :python:`'trust-constr'` method uses a
+    :py:class:`scipy.optimize.LinearConstraint`.
+
+    Parameters
+    ----------
+    fun
+        Function with signature :python:`fun(wec, x_wec, x_opt, waves)`
+        that returns the time series, e.g.
+        :py:meth:`wecopttool.pto.PTO.force_on_wec`.
+    lower
+        Lower bound, a scalar or an array with the size of the
+        flattened time series.
+        If :python:`None` the time series is not bounded below.
+    upper
+        Upper bound, a scalar or an array with the size of the
+        flattened time series.
+        If :python:`None` the time series is not bounded above.
+    affine
+        Whether :python:`fun` is affine in :python:`x_wec` and
+        :python:`x_opt`.
+
+    Raises
+    ------
+    ValueError
+        If neither :python:`lower` nor :python:`upper` are provided.
+
+    Examples
+    --------
+    Limit the PTO force to :python:`f_max`, evaluated at
+    :python:`nsubsteps` points per time step
+
+    >>> def f_pto(wec, x_wec, x_opt, waves):
+    ...     return pto.force_on_wec(wec, x_wec, x_opt, waves, nsubsteps)
+    >>> constraints = [wot.time_series_constraint(f_pto, -f_max, f_max)]
+    """
+    if (lower is None) and (upper is None):
+        raise ValueError("At least one of 'lower' or 'upper' is required.")
+
+    def constraint(wec, x_wec, x_opt, waves):
+        series = np.reshape(fun(wec, x_wec, x_opt, waves), -1)
+        values = []
+        if upper is not None:
+            values.append(upper - series)
+        if lower is not None:
+            values.append(series - lower)
+        return np.concatenate(values)
+
+    return {'type': 'ineq', 'fun': constraint, 'affine': affine}
+
+
+def aggregate_constraint(
+    constraint: Mapping,
+    scale: Optional[float] = 1.0,
+    method: Optional[str] = 'ks',
+    parameter: Optional[float] = 50.0,
+    ngroups: Optional[int] = 1,
+    rtol: Optional[float] = 1e-2,
+    max_updates: Optional[int] = 3,
+) -> dict:
+    """Aggregate an inequality constraint with many values, e.g. a
+    time series, into :python:`ngroups` smooth constraints.
+
+    The values :python:`g` of the constraint (:python:`g >= 0`) are
+    split into :python:`ngroups` consecutive groups, and each group is
+    replaced by a smooth lower bound of its minimum, so that the
+    aggregated constraint is conservative.
+    This reduces the size of the subproblems of the optimizer, e.g.
+    SLSQP, for constraints evaluated at every time step.
+    Each iteration is cheaper, but the optimizer typically needs many
+    more iterations than with the original constraint, in particular
+    if it is affine, see :py:func:`wecopttool.time_series_constraint`.
+    Aggregation is most useful for nonlinear constraints with many
+    values relative to the number of decision variables.
+
+    The aggregation uses the normalized values :python:`g/scale`:
+
+    * :python:`'ks'`: Kreisselmeier–Steinhauser function with parameter
+      :python:`rho`,
+      :python:`-log(Σexp(-rho*g/scale))/rho`,
+      which is at most :python:`log(n)/rho` below the minimum for
+      :python:`n` values.
+    * :python:`'pnorm'`: p-norm with :python:`p=parameter` of the
+      usage :python:`u = max(1 - g/scale, 0)`,
+      :python:`1 - ||u||_p`, intended for limits such as
+      :python:`f_max - |f|` with :python:`scale=f_max`, where the usage
+      is :python:`|f|/f_max`.
+
+    When used as a constraint of :py:meth:`wecopttool.WEC.solve`, the
+    original constraint is checked exactly at the solution.
+    If the aggregated constraint is active but the original constraint
+    is not, by more than :python:`rtol*scale`, the parameter is
+    doubled and the problem is solved again from the solution, at most
+    :python:`max_updates` times.
+    A warning is logged if the original constraint is violated by more
+    than :python:`rtol*scale` at the final solution.
+
+    Parameters
+    ----------
+    constraint
+        Inequality constraint dictionary, with a function with signature
+        :python:`fun(wec, x_wec, x_opt, waves)`.
+    scale
+        Typical magnitude of the constraint values, e.g. the limit of a
+        :py:func:`wecopttool.time_series_constraint`.
+    method
+        Aggregation function, :python:`'ks'` (default) or
+        :python:`'pnorm'`.
+    parameter
+        Initial aggregation parameter, :python:`rho` or :python:`p`.
+        Larger values are less conservative but less smooth.
+    ngroups
+        Number of aggregated constraints.
+    rtol
+        Relative tolerance for the exact check of the original
+        constraint.
+    max_updates
+        Maximum number of times the parameter is doubled.
+
+    Raises
+    ------
+    ValueError
+        If :python:`constraint` is not an inequality constraint.
+    ValueError
+        If :python:`method` is not :python:`'ks'` or
+        :python:`'pnorm'`.
+
+    Examples
+    --------
+    Limit the PTO force to :python:`f_max` with a single constraint
+
+    >>> constraint = wot.time_series_constraint(f_pto, -f_max, f_max)
+    >>> constraints = [wot.aggregate_constraint(constraint, f_max)]
+    """
+    if constraint['type'] != 'ineq':
+        raise ValueError("Only inequality constraints can be aggregated.")
+    methods = ['ks', 'pnorm']
+    if method not in methods:
+        raise ValueError(
+            f"Unknown aggregation method '{method}', must be one of " +
+            f"{methods}.")
+    fun = _AggregatedConstraint(
+        constraint['fun'], scale, method, parameter, ngroups, rtol,
+        max_updates)
+    return {'type': 'ineq', 'fun': fun}
+
+
 def run_bem(
     fb: cpy.FloatingBody,
     freq: Iterable[float] = [np.infty],
@@ -2487,6 +4884,114 @@ def decompose_state(
     return state[:nstate_wec], state[nstate_wec:]
 
 
+def regrid_state(
+    state: ArrayLike,
+    f1: float,
+    nfreq: int,
+    f1_new: float,
+    nfreq_new: int,
+) -> ndarray:
+    """Map a state vector to a different frequency grid.
+
+    The state vector consists of one or more consecutive blocks of
+    length :python:`ncomponents(nfreq)`, one per degree of freedom
+    (or per component of a Fourier-based optimization state), each
+    with the format :python:`x=[X0, Re(X1), Im(X1), ..., Re(Xn)]`.
+
+    If the fundamental frequency is unchanged, the Fourier coefficients
+    are truncated or zero-padded to :python:`nfreq_new` frequencies.
+    Otherwise the complex Fourier coefficients are linearly
+    interpolated to the new frequencies, and are zero above the highest
+    original frequency.
+    The amplitudes, except the mean (DC) component, are then scaled by
+    :python:`sqrt(f1_new/f1)`, so that the power spectral density,
+    e.g. of the response to an irregular wave, is unchanged by the
+    new frequency spacing.
+    The result is only a rough approximation, e.g. the phases of an
+    irregular wave realization on the original grid do not carry over
+    and a regular wave response is not preserved exactly.
+    This is intended for initial guesses from a solution on a
+    different grid, see the :python:`warm_start` argument of
+    :py:meth:`wecopttool.WEC.solve`.
+
+    Parameters
+    ----------
+    state
+        State vector on the original frequency grid.
+    f1
+        Original fundamental frequency :python:`f1` [:math:`Hz`].
+    nfreq
+        Original number of frequencies.
+    f1_new
+        New fundamental frequency [:math:`Hz`].
+    nfreq_new
+        New number of frequencies.
+
+    Raises
+    ------
+    ValueError
+        If the length of :python:`state` is not a multiple of
+        :python:`ncomponents(nfreq)`.
+    """
+    state = np.asarray(state)
+    ncomp = ncomponents(nfreq)
+    if state.size % ncomp != 0:
+        raise ValueError(
+            f"The state length ({state.size}) must be a multiple of " +
+            f"the number of components ({ncomp}).")
+    fd = real_to_complex(vec_to_dofmat(state, state.size // ncomp))
+    if np.isclose(f1, f1_new):
+        fd_new = np.zeros((nfreq_new+1, fd.shape[1]), dtype=complex)
+        nkeep = min(nfreq, nfreq_new) + 1
+        fd_new[:nkeep] = fd[:nkeep]
+    else:
+        freq = frequency(f1, nfreq)
+        freq_new = frequency(f1_new, nfreq_new)
+        interp = lambda y: np.stack(
+            [np.interp(freq_new, freq, iy, right=0.0) for iy in y.T], axis=1)
+        fd_new = interp(np.real(fd)) + 1j*interp(np.imag(fd))
+        # same power spectral density, |X|**2 / f1
+        fd_new[1:] = fd_new[1:] * np.sqrt(f1_new/f1)
+    fd_new[0] = np.real(fd_new[0])
+    return dofmat_to_vec(complex_to_real(fd_new))
+
+
+def _truncate_components(
+    vec: ArrayLike,
+    nfreq: int,
+    nfreq_new: int,
+) -> ndarray:
+    """Keep the first :python:`ncomponents(nfreq_new)` entries of each
+    block of length :python:`ncomponents(nfreq)` of a state-like vector,
+    e.g. a state, scale, or bound.
+    """
+    vec = np.reshape(vec, (-1, ncomponents(nfreq)))
+    return vec[:, :ncomponents(nfreq_new)].flatten()
+
+
+def _truncate_function(
+    fun: Callable,
+    nfreq: int,
+    truncated: dict,
+) -> Callable:
+    """Function restricted to the first :python:`nfreq` frequencies,
+    see :py:meth:`wecopttool.WEC.truncate`.
+
+    Bound methods of objects with a :python:`truncate` method are bound
+    to the truncated object, which is stored in :python:`truncated` by
+    the :python:`id` of the original object.
+    Other functions are returned as they are.
+    """
+    if isinstance(fun, (LinearForce, ExcitationForce)):
+        return fun.truncate(nfreq)
+    owner = getattr(fun, '__self__', None)
+    if (owner is None) or not callable(getattr(owner, 'truncate', None)):
+        return fun
+    if id(owner) not in truncated:
+        truncated[id(owner)] = owner.truncate(nfreq)
+    return getattr(truncated[id(owner)], fun.__name__)
+
+
 def frequency_parameters(
     freqs: ArrayLike,
     zero_freq: bool = True,
@@ -2545,10 +5050,21 @@ def frequency_parameters(
     return f1, nfreq
 
 
-def time_results(fd: DataArray, time: DataArray) -> ndarray:
+def time_results(fd: DataArray, time: DataArray) -> DataArray:
     """Create a :py:class:`xarray.DataArray` of time-domain results from
     :py:class:`xarray.DataArray` of frequency-domain results.
 
+    The time-domain response is
+    :python:`Σ Re(X_k exp(i*omega_k*t))` for the complex amplitudes
+    :python:`X_k` along the :python:`omega` dimension.
+    If :python:`omega` is a zero-padded harmonic grid,
+    :python:`omega_k = k*omega_1` starting at zero, and :python:`time`
+    are equally spaced samples starting at zero with an integer number
+    of samples per period of :python:`omega_1`, e.g.
+    :py:meth:`wecopttool.WEC.time_nsubsteps`, a single inverse real FFT
+    (:py:func:`numpy.fft.irfft`) is used.
+    Otherwise the response is computed as a single matrix product.
+
     Parameters
     ----------
     fd
@@ -2556,11 +5072,50 @@ def time_results(fd: DataArray, time: DataArray) -> ndarray:
     time
         Time array.
     """
-    out = np.zeros((*fd.isel(omega=0).shape, len(time)))
-    for w, mag in zip(fd.omega, fd):
-        out = out + \
-            np.real(mag)*np.cos(w*time) - np.imag(mag)*np.sin(w*time)
-    return out
+    fd = fd.transpose(..., 'omega')
+    omega = fd.omega.values
+    t_vals = np.asarray(time.values)
+    values = fd.values
+    nfft = _irfft_size(omega, t_vals)
+    if nfft is not None:
+        coeffs = np.zeros((*values.shape[:-1], nfft//2 + 1), dtype=complex)
+        coeffs[..., :len(omega)] = values / 2
+        coeffs[..., 0] = values[..., 0]
+        if len(omega) == nfft//2 + 1:
+            coeffs[..., -1] = values[..., -1]
+        td = np.fft.irfft(coeffs, n=nfft, axis=-1, norm='forward')
+        td = td[..., :len(t_vals)]
+    else:
+        phase = np.outer(omega, t_vals)
+        td = np.real(values) @ np.cos(phase) - np.imag(values) @ np.sin(phase)
+    dims = [dim for dim in fd.dims if dim != 'omega'] + ['time']
+    coords = {name: coord for name, coord in fd.coords.items()
+              if 'omega' not in coord.dims}
+    coords['time'] = time
+    return DataArray(data=td, dims=dims, coords=coords, name=fd.name)
+
+
+def _irfft_size(omega: ndarray, time: ndarray) -> Optional[int]:
+    """Length of the inverse real FFT that evaluates the frequencies
+    :python:`omega` at :python:`time`, or :python:`None` if they are not
+    a harmonic grid and equally spaced samples of its period.
+    """
+    if (len(omega) < 2) or (len(time) < 2) or (omega[0] != 0):
+        return None
+    w1 = omega[1]
+    dt = time[1] - time[0]
+    if (w1 <= 0) or (dt <= 0):
+        return None
+    harmonics = np.arange(len(omega))
+    samples = np.arange(len(time))
+    nfft = int(round(2*np.pi / (w1*dt)))
+    uniform = (np.allclose(omega, harmonics*w1, rtol=1e-10, atol=0)
+               and np.allclose(time, samples*dt, rtol=1e-10, atol=1e-12*dt))
+    if (not uniform) or (not np.isclose(nfft*w1*dt, 2*np.pi, rtol=1e-10)):
+        return None
+    if (nfft//2 + 1 < len(omega)) or (nfft < len(time)):
+        return None
+    return nfft
 
 
 def set_fb_centers(
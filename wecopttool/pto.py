@@ -26,20 +26,22 @@ __all__ = [
 ]
 
 
-from typing import Optional, TypeVar, Callable, Union
+from typing import Optional, TypeVar, Callable, Union, Iterable, Iterator
+from functools import wraps
+from contextlib import contextmanager
 
 import autograd.numpy as np
 from autograd.builtins import isinstance, tuple, list, dict
 from autograd.numpy import ndarray
-from scipy.linalg import block_diag
 from scipy.optimize import OptimizeResult
 from xarray import DataArray, Dataset
 from datetime import datetime
 from scipy.optimize import OptimizeResult
 
-from wecopttool.core import complex_to_real, td_to_fd
+from wecopttool.core import complex_to_real, td_to_fd, state_to_td
 from wecopttool.core import dofmat_to_vec, vec_to_dofmat
 from wecopttool.core import TWEC, TStateFunction, FloatOrArray
+from wecopttool.core import MIMOTransferMatrix
 
 
 # type aliases
@@ -47,6 +49,18 @@ TPTO = TypeVar("TPTO", bound="PTO")
 TLOSS = Callable[[FloatOrArray, FloatOrArray], FloatOrArray]
 
 
+def _cached_evaluation(method: Callable) -> Callable:
+    """Share the values of a :py:class:`wecopttool.pto.PTO` method for
+    the same arguments, see :py:meth:`wecopttool.pto.PTO.cached`.
+    """
+    @wraps(method)
+    def cached_method(pto, wec, x_wec, x_opt, waves=None, nsubsteps=1):
+        return pto._evaluate(
+            method.__name__, lambda *args: method(pto, *args),
+            wec, x_wec, x_opt, waves, nsubsteps)
+    return cached_method
+
+
 class PTO:
     """A power take-off (PTO) object to be used in conjunction with a
     :py:class:`wecopttool.WEC` object.
@@ -98,31 +112,46 @@ class PTO:
             PTO names.
         """
         self._ndof = ndof
+        self._cache_depth = 0
+        self._cache = None
         # names
         if names is None:
             names = [f'PTO_{i}' for i in range(ndof)]
         elif ndof == 1 and isinstance(names, str):
             names = [names]
         self._names = names
-        # kinematics
+        # kinematics, a constant matrix is also applied directly
+        self._kinematics_in = kinematics
+        self._kinematics_mat = None
         if callable(kinematics):
             def kinematics_fun(wec, x_wec, x_opt, waves, nsubsteps=1):
                 pos_wec = wec.vec_to_dofmat(x_wec)
-                tmat = self._tmat(wec, nsubsteps)
-                pos_wec_td = np.dot(tmat, pos_wec)
+                pos_wec_td = state_to_td(pos_wec, nsubsteps)
                 return kinematics(pos_wec_td)
         else:
+            self._kinematics_mat = np.array(kinematics, dtype=float)
+
             def kinematics_fun(wec, x_wec, x_opt, waves, nsubsteps=1):
                 n = wec.nt*nsubsteps
                 return np.repeat(kinematics[:, :, np.newaxis], n, axis=-1)
-        self._kinematics = kinematics_fun
+
+        def kinematics_cached(wec, x_wec, x_opt, waves, nsubsteps=1):
+            return self._evaluate('kinematics', kinematics_fun,
+                                  wec, x_wec, x_opt, waves, nsubsteps)
+
+        self._kinematics = kinematics_cached
         # controller
         if controller is None:
             controller = controller_unstructured
+        self._controller = controller
 
-        def force(wec, x_wec, x_opt, waves, nsubsteps=1):
+        def controller_fun(wec, x_wec, x_opt, waves, nsubsteps=1):
             return controller(self, wec, x_wec, x_opt, waves, nsubsteps)
 
+        def force(wec, x_wec, x_opt, waves=None, nsubsteps=1):
+            return self._evaluate('force', controller_fun,
+                                  wec, x_wec, x_opt, waves, nsubsteps)
+
         self._force = force
 
         # power
@@ -143,7 +172,7 @@ class PTO:
                         "all frequencies."
                     )
             impedance_abcd = _make_abcd(impedance, ndof)
-            self._transfer_mat = _make_mimo_transfer_mat(impedance_abcd, ndof)
+            self._transfer_mat = _make_transfer_mat(impedance_abcd)
         else:
             self._transfer_mat = None
         self._impedance = impedance
@@ -181,16 +210,100 @@ class PTO:
         return self._loss
 
     @property
-    def transfer_mat(self) -> ndarray:
-        """Transfer matrix."""
+    def transfer_mat(self) -> MIMOTransferMatrix:
+        """Transfer matrix, see
+        :py:class:`wecopttool.MIMOTransferMatrix`.
+        """
         return self._transfer_mat
 
-    def _tmat(self, wec, nsubsteps: Optional[int] = 1):
-        if nsubsteps==1:
-            tmat = wec.time_mat
-        else:
-            tmat = wec.time_mat_nsubsteps(nsubsteps)
-        return tmat
+    def truncate(self, nfreq: int) -> PTO:
+        """Create a copy of the PTO restricted to the first
+        :python:`nfreq` frequencies.
+
+        The impedance, if any, is truncated.
+        The kinematics, controller, loss and names are the same.
+        Used by :py:meth:`wecopttool.WEC.truncate`, e.g. for the
+        :python:`nfreq_coarse` argument of
+        :py:meth:`wecopttool.WEC.solve`.
+
+        Parameters
+        ----------
+        nfreq
+            Number of frequencies (not including zero frequency) of the
+            new PTO.
+
+        Raises
+        ------
+        ValueError
+            If :python:`nfreq` is larger than the number of frequencies
+            of the impedance.
+        """
+        impedance = self.impedance
+        if impedance is not None:
+            if nfreq > impedance.shape[2]:
+                raise ValueError(
+                    f"'nfreq' ({nfreq}) cannot be larger than the number " +
+                    "of frequencies of the impedance " +
+                    f"({impedance.shape[2]}).")
+            impedance = impedance[:, :, :nfreq]
+        return PTO(self.ndof, self._kinematics_in, self._controller,
+                   impedance, self.loss, self.names)
+
+    @contextmanager
+    def cached(self) -> Iterator[PTO]:
+        """Context in which each PTO quantity is only computed once for
+        the same arguments.
+
+        The kinematics, force, position, velocity, acceleration, power
+        variables, and power are stored when first computed for given
+        :python:`wec`, :python:`x_wec`, :python:`x_opt`,
+        :python:`waves` and :python:`nsubsteps`, and reused by the
+        other methods, e.g. the velocity computed by a controller is
+        reused by :py:meth:`wecopttool.pto.PTO.power`.
+        The arguments are identified by identity, so this also works
+        for arrays traced by
+        `autograd <https://github.com/HIPS/autograd>`_, and should not
+        be modified inside the context.
+        Each method call, e.g. an objective function
+        :py:meth:`wecopttool.pto.PTO.average_power`, is evaluated in
+        this context, so this is only needed to share the quantities
+        between separate calls, e.g. in a user-defined function.
+        The stored quantities are discarded when leaving the outermost
+        context.
+        """
+        if self._cache_depth == 0:
+            self._cache = {}
+        self._cache_depth += 1
+        try:
+            yield self
+        finally:
+            self._cache_depth -= 1
+            if self._cache_depth == 0:
+                self._cache = None
+
+    def _evaluate(self,
+        name: str,
+        fun: TStateFunction,
+        wec: TWEC,
+        x_wec: ndarray,
+        x_opt: ndarray,
+        waves: Optional[Dataset],
+        nsubsteps: int,
+    ) -> ndarray:
+        """Evaluate :python:`fun`, or reuse its value for the same
+        arguments, see :py:meth:`wecopttool.pto.PTO.cached`.
+        """
+        with self.cached():
+            args = (wec, x_wec, x_opt, waves)
+            key = (name, nsubsteps) + tuple(id(arg) for arg in args)
+            stored = self._cache.get(key)
+            if (stored is not None) and all(
+                    a is b for a, b in zip(stored[0], args)):
+                return stored[1]
+            value = fun(wec, x_wec, x_opt, waves, nsubsteps)
+            # keep the arguments, so that their ids are not reused
+            self._cache[key] = (args, value)
+            return value
 
     def _fkinematics(self,
         f_wec: ndarray,
@@ -202,6 +315,9 @@ class PTO:
     ) -> ndarray:
         """Return time-domain values in the PTO frame.
 
+        Constant (linear) kinematics are applied to the Fourier
+        coefficients, before the conversion to the time domain.
+
         Parameters
         ----------
         f_wec
@@ -220,13 +336,16 @@ class PTO:
             A value of :python:`1` corresponds to the default step
             length.
         """
-        time_mat = self._tmat(wec, nsubsteps)
-        f_wec_td = np.dot(time_mat, f_wec)
+        if self._kinematics_mat is not None:
+            return state_to_td(
+                np.dot(f_wec, self._kinematics_mat.T), nsubsteps)
+        f_wec_td = state_to_td(f_wec, nsubsteps)
         assert f_wec_td.shape == (wec.nt*nsubsteps, wec.ndof)
         f_wec_td = np.expand_dims(np.transpose(f_wec_td), axis=0)
         kinematics_mat = self.kinematics(wec, x_wec, x_opt, waves, nsubsteps)
         return np.transpose(np.sum(kinematics_mat*f_wec_td, axis=1))
 
+    @_cached_evaluation
     def position(self,
         wec: TWEC,
         x_wec: ndarray,
@@ -255,6 +374,7 @@ class PTO:
         pos_wec = wec.vec_to_dofmat(x_wec)
         return self._fkinematics(pos_wec, wec, x_wec, x_opt, waves, nsubsteps)
 
+    @_cached_evaluation
     def velocity(self,
         wec: TWEC,
         x_wec: ndarray,
@@ -284,6 +404,7 @@ class PTO:
         vel_wec = np.dot(wec.derivative_mat, pos_wec)
         return self._fkinematics(vel_wec, wec, x_wec, x_opt, waves, nsubsteps)
 
+    @_cached_evaluation
     def acceleration(self,
         wec: TWEC,
         x_wec: ndarray,
@@ -340,12 +461,15 @@ class PTO:
         """
         force_td = self.force(wec, x_wec, x_opt, waves, nsubsteps)
         assert force_td.shape == (wec.nt*nsubsteps, self.ndof)
+        if self._kinematics_mat is not None:
+            return np.dot(force_td, self._kinematics_mat)
         force_td = np.expand_dims(np.transpose(force_td), axis=0)
         assert force_td.shape == (1, self.ndof, wec.nt*nsubsteps)
         kinematics_mat = self.kinematics(wec, x_wec, x_opt, waves, nsubsteps)
         kinematics_mat = np.transpose(kinematics_mat, (1,0,2))
         return np.transpose(np.sum(kinematics_mat*force_td, axis=1))
 
+    @_cached_evaluation
     def mechanical_power(self,
         wec: TWEC,
         x_wec: ndarray,
@@ -434,6 +558,7 @@ class PTO:
         energy = self.mechanical_energy(wec, x_wec, x_opt, waves, nsubsteps)
         return energy / wec.tf
 
+    @_cached_evaluation
     def power_variables(self,
         wec: TWEC,
         x_wec: ndarray,
@@ -469,18 +594,18 @@ class PTO:
             e1 = complex_to_real(td_to_fd(e1_td, False))
             vars_1 = np.hstack([q1, e1])
             vars_1_flat = dofmat_to_vec(vars_1)
-            vars_2_flat = np.dot(self.transfer_mat, vars_1_flat)
+            vars_2_flat = self.transfer_mat @ vars_1_flat
             vars_2 = vec_to_dofmat(vars_2_flat, 2*self.ndof)
             q2 = vars_2[:, :self.ndof]
             e2 = vars_2[:, self.ndof:]
-            time_mat = self._tmat(wec, nsubsteps)
-            q2_td = np.dot(time_mat, q2)
-            e2_td = np.dot(time_mat, e2)
+            q2_td = state_to_td(q2, nsubsteps)
+            e2_td = state_to_td(e2, nsubsteps)
         else:
             q2_td = self.velocity(wec, x_wec, x_opt, waves, nsubsteps)
             e2_td = self.force(wec, x_wec, x_opt, waves, nsubsteps)
         return q2_td, e2_td
 
+    @_cached_evaluation
     def power(self,
         wec: TWEC,
         x_wec: ndarray,
@@ -659,7 +784,9 @@ class PTO:
         res: Union[OptimizeResult, list],
         waves: Optional[DataArray] = None,
         nsubsteps: Optional[int] = 1,
-    ) -> tuple[list[Dataset], list[Dataset]]:
+        batch: Optional[bool] = False,
+        variables: Optional[Iterable[str]] = None,
+    ) -> Union[tuple[list[Dataset], list[Dataset]], tuple[Dataset, Dataset]]:
         """Transform the results from optimization solution to a form
         that the user can work with directly.
 
@@ -684,6 +811,16 @@ class PTO:
                                                       nsubsteps=4)
         >>> res_pto_td[0].power.plot()
 
+        To get a single dataset for all realizations
+
+        >>> res_pto_fd, res_pto_td = pto.post_process(wec, res_opt, wave,
+                                                      batch=True)
+
+        To only compute the power and force
+
+        >>> res_pto_fd, res_pto_td = pto.post_process(
+                wec, res_opt, wave, variables=['power', 'force'])
+
         Parameters
         ----------
         wec
@@ -697,49 +834,72 @@ class PTO:
             Number of steps between the default (implied) time steps.
             A value of :python:`1` corresponds to the default step
             length.
+        batch
+            If :python:`True`, post-process all realizations together
+            and return a single :py:class:`xarray.Dataset` for each
+            domain, with a :python:`realization` dimension, instead of
+            lists.
+            The datasets are created only once, and the conversions to
+            the frequency domain are done for all realizations at once.
+        variables
+            Names of the variables to compute, any of :python:`'pos'`,
+            :python:`'vel'`, :python:`'acc'`, :python:`'force'`,
+            :python:`'power'` (mechanical and electrical), and, if the
+            PTO has an impedance, :python:`'trans_flo'` and
+            :python:`'trans_eff'`.
+            Other variables are not computed.
+            If :python:`None` (default) all available variables are
+            computed.
+
+        Raises
+        ------
+        ValueError
+            If :python:`variables` contains an unknown or unavailable
+            variable name.
 
         Returns
         -------
         results_fd
-            list of :py:class:`xarray.Dataset` with frequency domain results.
+            list of :py:class:`xarray.Dataset` with frequency domain
+            results, or a single :py:class:`xarray.Dataset` if
+            :python:`batch` is :python:`True`.
         results_td
-            list of :py:class:`xarray.Dataset` with time domain results.
+            list of :py:class:`xarray.Dataset` with time domain results,
+            or a single :py:class:`xarray.Dataset` if :python:`batch` is
+            :python:`True`.
         """
+        all_variables = ['pos', 'vel', 'acc', 'force', 'power']
+        if self.impedance is not None:
+            all_variables += ['trans_flo', 'trans_eff']
+        if variables is None:
+            variables = all_variables
+        elif isinstance(variables, str):
+            variables = [variables]
+        unknown = set(variables) - set(all_variables)
+        if unknown:
+            raise ValueError(f"Unknown or unavailable variables " +
+                             f"{sorted(unknown)}, must be in {all_variables}.")
+
         def _postproc(wec, res, waves, nsubsteps):
 
             create_time = f"{datetime.utcnow()}"
 
-            x_wec, x_opt = wec.decompose_state(res.x)
-
-            # position
-            pos_td = self.position(wec, x_wec, x_opt, waves, nsubsteps)
-            pos_fd = wec.td_to_fd(pos_td[::nsubsteps])
-
-            # velocity
-            vel_td = self.velocity(wec, x_wec, x_opt, waves, nsubsteps)
-            vel_fd = wec.td_to_fd(vel_td[::nsubsteps])
+            states = [wec.decompose_state(ires.x) for ires in res]
+            waves_list = [waves.isel(realization=i) for i in range(len(res))]
 
-            # acceleration
-            acc_td = self.acceleration(wec, x_wec, x_opt, waves, nsubsteps)
-            acc_fd = wec.td_to_fd(acc_td[::nsubsteps])
+            def evaluate(fun):
+                # time series of all realizations, (realization, time, dof)
+                return np.stack([
+                    fun(wec, x_wec, x_opt, iwaves, nsubsteps)
+                    for (x_wec, x_opt), iwaves in zip(states, waves_list)])
 
-            # force
-            force_td = self.force(wec, x_wec, x_opt, waves, nsubsteps)
-            force_fd = wec.td_to_fd(force_td[::nsubsteps])
-
-            # power
-            elec_power_td = self.power(wec, x_wec, x_opt, waves, nsubsteps)
-            elec_power_fd = wec.td_to_fd(elec_power_td[::nsubsteps])
-
-            # mechanical power
-            mech_power_td = self.mechanical_power(wec, x_wec, x_opt, waves,
-                                                nsubsteps)
-            mech_power_fd = wec.td_to_fd(mech_power_td[::nsubsteps])
-
-            # stack mechanical and electrical power
-            power_names = ['mech','elec']
-            power_fd = np.stack((mech_power_fd,elec_power_fd))
-            power_td = np.stack((mech_power_td,elec_power_td))
+            def to_fd(td):
+                # all realizations as columns of a single conversion
+                nreal, _, ndof = td.shape
+                td = np.transpose(td[:, ::nsubsteps], (1, 0, 2))
+                fd = wec.td_to_fd(np.reshape(td, (td.shape[0], -1)))
+                fd = np.reshape(fd, (fd.shape[0], nreal, ndof))
+                return np.transpose(fd, (1, 0, 2))
 
             pos_attr = {'long_name': 'Position', 'units': 'm or rad'}
             vel_attr = {'long_name': 'Velocity', 'units': 'm/s or rad/s'}
@@ -755,18 +915,61 @@ class PTO:
             dof_attr = {'long_name': 'PTO degree of freedom'}
             time_attr = {'long_name': 'Time', 'units': 's'}
             type_attr = {'long_name': 'Power type'}
+            q2_attr = {'long_name': 'Transduced Flow',
+                    'units': 'A or m^3/s or rad/s or m/s'}
+            e2_attr = {'long_name': 'Transduced Effort',
+                    'units': 'V or N/m^2 or Nm or Ns'}
+
+            # position, velocity, acceleration, and force
+            fd_vars = {}
+            td_vars = {}
+            dims_fd = ['realization', 'omega', 'dof']
+            dims_td = ['realization', 'time', 'dof']
+            quantities = {'pos': (self.position, pos_attr),
+                          'vel': (self.velocity, vel_attr),
+                          'acc': (self.acceleration, acc_attr),
+                          'force': (self.force, force_attr)}
+            for name, (fun, attr) in quantities.items():
+                if name in variables:
+                    value_td = evaluate(fun)
+                    fd_vars[name] = (dims_fd, to_fd(value_td), attr)
+                    td_vars[name] = (dims_td, value_td, attr)
+
+            # stack mechanical and electrical power
+            power_names = ['mech','elec']
+            if 'power' in variables:
+                elec_power_td = evaluate(self.power)
+                elec_power_fd = to_fd(elec_power_td)
+                mech_power_td = evaluate(self.mechanical_power)
+                mech_power_fd = to_fd(mech_power_td)
+                power_fd = np.stack((mech_power_fd,elec_power_fd), axis=1)
+                power_td = np.stack((mech_power_td,elec_power_td), axis=1)
+                fd_vars['power'] = (['realization', 'type', 'omega', 'dof'],
+                                    power_fd, power_attr)
+                td_vars['power'] = (['realization', 'type', 'time', 'dof'],
+                                    power_td, power_attr)
+
+            #transduced flow and effort variables
+            if ('trans_flo' in variables) or ('trans_eff' in variables):
+                q2_e2_td = [
+                    self.power_variables(wec, x_wec, x_opt, iwaves, nsubsteps)
+                    for (x_wec, x_opt), iwaves in zip(states, waves_list)]
+                transduced = {
+                    'trans_flo': (np.stack([q2 for q2, _ in q2_e2_td]),
+                                  q2_attr),
+                    'trans_eff': (np.stack([e2 for _, e2 in q2_e2_td]),
+                                  e2_attr)}
+                for name, (value_td, attr) in transduced.items():
+                    if name in variables:
+                        fd_vars[name] = (dims_fd, to_fd(value_td), attr)
+                        td_vars[name] = (dims_td, value_td, attr)
 
             t_dat = wec.time_nsubsteps(nsubsteps)
 
             results_fd = Dataset(
-                data_vars={
-                    'pos': (['omega','dof'], pos_fd, pos_attr),
-                    'vel': (['omega','dof'], vel_fd, vel_attr),
-                    'acc': (['omega','dof'], acc_fd, acc_attr),
-                    'force': (['omega','dof'], force_fd, force_attr),
-                    'power': (['type','omega','dof'], power_fd, power_attr),
-                },
+                data_vars=fd_vars,
                 coords={
+                    'realization': waves.realization,
                     'omega':('omega', wec.omega, omega_attr),
                     'freq':('omega', wec.frequency, freq_attr),
                     'period':('omega', wec.period, period_attr),
@@ -776,51 +979,31 @@ class PTO:
                 )
 
             results_td = Dataset(
-                data_vars={
-                    'pos': (['time','dof'], pos_td, pos_attr),
-                    'vel': (['time','dof'], vel_td, vel_attr),
-                    'acc': (['time','dof'], acc_td, acc_attr),
-                    'force': (['time','dof'], force_td, force_attr),
-                    'power': (['type','time','dof'], power_td, power_attr),
-                },
+                data_vars=td_vars,
                 coords={
+                    'realization': waves.realization,
                     'time':('time', t_dat, time_attr),
                     'dof':('dof', self.names, dof_attr),
                     'type':('type', power_names, power_attr)},
                 attrs={"time_created_utc": create_time}
                 )
 
-            if self.impedance is not None:
-            #transduced flow and effort variables
-                q2_td, e2_td = self.power_variables(wec, x_wec, x_opt,
-                                                    waves, nsubsteps)
-                q2_fd = wec.td_to_fd(q2_td[::nsubsteps])
-                e2_fd = wec.td_to_fd(e2_td[::nsubsteps])
-
-                q2_attr = {'long_name': 'Transduced Flow',
-                        'units': 'A or m^3/s or rad/s or m/s'}
-                e2_attr = {'long_name': 'Transduced Effort',
-                        'units': 'V or N/m^2 or Nm or Ns'}
-
-                results_td = results_td.assign({
-                            'trans_flo': (['time','dof'], q2_td, q2_attr),
-                            'trans_eff': (['time','dof'], e2_td, e2_attr),
-                        })
-                results_fd = results_fd.assign({
-                            'trans_flo': (['omega','dof'], q2_fd, q2_attr),
-                            'trans_eff': (['omega','dof'], e2_fd, e2_attr),
-                        })
-
-
             return results_fd, results_td
 
-        results_fd = []
-        results_td = []
-        for idx, ires in enumerate(res):
-            ifd, itd = _postproc(wec, ires, waves.sel(realization=idx), nsubsteps)
-            results_fd.append(ifd)
-            results_td.append(itd)
-        return results_fd, results_td
+        # PTO quantities are shared between the variables
+        with self.cached():
+            if batch:
+                realizations = list(range(len(res)))
+                return _postproc(
+                    wec, res, waves.sel(realization=realizations), nsubsteps)
+            results_fd = []
+            results_td = []
+            for idx, ires in enumerate(res):
+                ifd, itd = _postproc(
+                    wec, [ires], waves.sel(realization=[idx]), nsubsteps)
+                results_fd.append(ifd.isel(realization=0, drop=True))
+                results_td.append(itd.isel(realization=0, drop=True))
+            return results_fd, results_td
 
 
 # power conversion chain
@@ -853,6 +1036,21 @@ def _make_abcd(impedance: ndarray, ndof: int) -> ndarray:
     return np.vstack([row_1, row_2])
 
 
+def _make_transfer_mat(impedance_abcd: ndarray) -> MIMOTransferMatrix:
+    """Create the compact MIMO transfer matrix of the PTO.
+
+    Parameters
+    ----------
+    impedance_abcd
+        PTO impedance in ABCD form.
+    """
+    transfer_mat = np.transpose(impedance_abcd, (2, 0, 1))
+    # re[0] used for the zero frequency power loss (DC), could be re[n]
+    transfer_mat = np.concatenate(
+        [np.real(transfer_mat[:1]), transfer_mat], axis=0)
+    return MIMOTransferMatrix(transfer_mat)
+
+
 def _make_mimo_transfer_mat(
     impedance_abcd: ndarray,
     ndof: int,
@@ -866,25 +1064,7 @@ def _make_mimo_transfer_mat(
     ndof
         Number of degrees of freedom.
     """
-    def block(re, im): return np.array([[re, -im], [im, re]])
-    for idof in range(2*ndof):
-        for jdof in range(2*ndof):
-            Zp = impedance_abcd[idof, jdof, :]
-            re = np.real(Zp)
-            im = np.imag(Zp)
-            # Exclude the sine component of the 2-point wave
-            blocks = [block(ire, iim) for (ire, iim) in zip(re[:-1], im[:-1])]
-            # re[0] added for the zero frequency power loss (DC), could be re[n]
-            blocks = [re[0]] + blocks + [re[-1]]
-            if jdof==0:
-                row = block_diag(*blocks)
-            else:
-                row = np.hstack([row, block_diag(*blocks)])
-        if idof==0:
-            mat = row
-        else:
-            mat = np.vstack([mat, row])
-    return mat
+    return _make_transfer_mat(impedance_abcd).to_dense()
 
 
 # controllers
@@ -917,9 +1097,8 @@ def controller_unstructured(
         A value of :python:`1` corresponds to the default step
         length.
     """
-    tmat = pto._tmat(wec, nsubsteps)
-    x_opt = np.reshape(x_opt[:len(tmat[0])*pto.ndof], (-1, pto.ndof), order='F')
-    return np.dot(tmat, x_opt)
+    x_opt = np.reshape(x_opt[:wec.ncomponents*pto.ndof], (-1, pto.ndof), order='F')
+    return state_to_td(x_opt, nsubsteps)
 
 
 def controller_pid(